@@ -1,5 +1,10 @@
 #include <Arduino.h>
 
+// Uncomment to send each sample as a 2-byte binary frame instead of one ASCII
+// line. The default text output works with Serial Monitor/Plotter and every
+// line-based Python reader; Backups/program.py reads either (BINARY_FRAMES).
+// #define PPG_BINARY_FRAMES
+
 // Pin Definitions (Arduino Nano ESP32)
 const int PULSE_SENSOR_PIN = A0;  // Analog input pin for the pulse sensor
 const int LED13 = LED_BUILTIN;    // On-board Arduino LED
@@ -89,6 +94,14 @@ void readPulseSensor() {
 
   if (hasSample) {
     Signal = s;
+#ifdef PPG_BINARY_FRAMES
+    // 2-byte frame, no text formatting or newline: sync bit set + top 5 bits,
+    // then the low 7 bits with the sync bit clear, so the reader can always
+    // tell a frame start from its second byte
+    Serial.write(0x80 | (Signal >> 7));
+    Serial.write(Signal & 0x7F);
+#else
     Serial.println(Signal); // Output only the signal
+#endif
   }
 }
\ No newline at end of file
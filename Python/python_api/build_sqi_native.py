@@ -0,0 +1,28 @@
+"""
+Ahead-of-time build of the SQI and RMSSD kernels into the sqi_native extension.
+
+Run once per platform before starting the API (or packaging the .exe):
+
+    python build_sqi_native.py
+
+sqi_numba picks up the compiled module when it is importable and skips the
+JIT compile at startup; without it the API falls back to numba's JIT.
+"""
+
+import os
+
+from numba.pycc import CC
+
+from sqi_numba import bad_segment_mask, rmssd_from_peak_indices
+
+cc = CC("sqi_native")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# AOT exports take one signature each, so the mask gets a name per input dtype
+cc.export("bad_segment_mask_i2", "b1[:](i2[::1], i8)")(bad_segment_mask.py_func)
+cc.export("bad_segment_mask_f4", "b1[:](f4[::1], i8)")(bad_segment_mask.py_func)
+cc.export("rmssd_from_peak_indices", "f8(i8[::1], f8)")(rmssd_from_peak_indices.py_func)
+
+
+if __name__ == "__main__":
+    cc.compile()
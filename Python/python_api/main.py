@@ -6,26 +6,84 @@ from PPG (photoplethysmography) signal data with signal quality assessment,
 and real-time HR amplitude (RSA) biofeedback via session-based endpoints.
 """
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, field_validator
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import multiprocessing
 import uuid
 import numpy as np
 import neurokit2 as nk
-from scipy.signal import find_peaks
+import orjson
+from scipy.signal import butter, find_peaks, sosfiltfilt
 import os
 import warnings
 
+from sqi_numba import find_bad_segments, rmssd_ms, warm_up as warm_up_sqi
+
 # Suppress warnings from neurokit2
 warnings.filterwarnings("ignore")
 
+
+
+class ORJSONRequest(Request):
+    """Request that decodes JSON bodies with orjson instead of the stdlib json module"""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """Route that hands endpoints an ORJSONRequest so request bodies are parsed in C"""
+
+    def get_route_handler(self):
+        original_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request):
+            return await original_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
+
+
+def _get_worker_count() -> int:
+    """Analysis worker count: HRV_WORKERS if set, otherwise at most 4"""
+    # Each worker imports neurokit2/scipy and compiles the numba kernels itself
+    raw = os.getenv("HRV_WORKERS", "").strip()
+    if raw:
+        return max(1, int(raw))
+    return min(4, os.cpu_count() or 1)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the analysis process pool for the app's lifetime; each worker compiles the numba kernels once"""
+    warm_up_sqi()
+    app.state.pool = ProcessPoolExecutor(
+        max_workers=_get_worker_count(),
+        initializer=warm_up_sqi,
+    )
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown()
+
+
 app = FastAPI(
     title="HRV Analysis API",
     description="Calculate HRV RMSSD from PPG signal data with quality checks",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
+app.router.route_class = ORJSONRoute
 
 def clean_peaks(ppg_window, peak_indices, rising_window=5, min_distance=20):
     """
@@ -115,16 +173,6 @@ class HRVRequest(BaseModel):
         example=0
     )
 
-    @field_validator("ppg_data")
-    @classmethod
-    def validate_ppg_data(cls, v):
-        """Validate PPG data array"""
-        if not v:
-            raise ValueError("ppg_data cannot be empty")
-        if any(not isinstance(x, (int, float)) for x in v):
-            raise ValueError("ppg_data must contain only numeric values")
-        return v
-
 
 class HRVResponse(BaseModel):
     """Response model for successful HRV calculation"""
@@ -142,13 +190,60 @@ class HRVErrorResponse(BaseModel):
     bad_segments: int = Field(..., description="Number of bad 3-second segments detected")
 
 
-def is_segment_bad(segment: np.ndarray, sampling_rate: float) -> bool:
+# Bandpass SOS coefficients keyed by sampling rate
+_bandpass_sos_cache: Dict[float, np.ndarray] = {}
+_ppg_clean_sos_cache: Dict[float, np.ndarray] = {}
+
+
+def get_bandpass_sos(sampling_rate: float) -> np.ndarray:
+    """
+    Get 0.5-8 Hz Butterworth bandpass coefficients, designed once per sampling rate.
+
+    Args:
+        sampling_rate: Sampling rate in Hz
+
+    Returns:
+        Second-order sections array for scipy.signal.sosfiltfilt
+    """
+    sos = _bandpass_sos_cache.get(sampling_rate)
+    if sos is None:
+        high = min(8.0, 0.45 * sampling_rate)
+        sos = butter(3, [0.5, high], btype="bandpass", fs=sampling_rate, output="sos")
+        _bandpass_sos_cache[sampling_rate] = sos
+    return sos
+
+
+def get_ppg_clean_sos(sampling_rate: float) -> np.ndarray:
+    """
+    Get the 0.5-8 Hz order-2 Butterworth that nk.ppg_clean designs on every call
+    (default "elgendi" method), designed once per sampling rate.
+
+    Args:
+        sampling_rate: Sampling rate in Hz
+
+    Returns:
+        Second-order sections array for scipy.signal.sosfiltfilt
+    """
+    sos = _ppg_clean_sos_cache.get(sampling_rate)
+    if sos is None:
+        sos = butter(2, [0.5, 8], btype="bandpass", fs=sampling_rate, output="sos")
+        _ppg_clean_sos_cache[sampling_rate] = sos
+    return sos
+
+
+def is_segment_bad(
+    segment: np.ndarray,
+    sampling_rate: float,
+    diff_buf: Optional[np.ndarray] = None
+) -> bool:
     """
     Quick Signal Quality Index (SQI) checks to detect bad 3-second segments.
 
     Args:
         segment: Numpy array of PPG values for a 3-second segment
         sampling_rate: Sampling rate in Hz
+        diff_buf: Optional float32 scratch buffer of len(segment) - 1 reused for
+            the sample-to-sample differences (allocated if not given)
 
     Returns:
         True if the segment is likely corrupted, False otherwise
@@ -156,30 +251,78 @@ def is_segment_bad(segment: np.ndarray, sampling_rate: float) -> bool:
     if len(segment) == 0:
         return True
 
-    seg = np.asarray(segment, dtype=float)
+    seg = np.asarray(segment, dtype=np.float32)
+    n = seg.size
 
-    # 1. Flatline / low variance check
-    if np.std(seg) < 1.0:
+    # Peak-to-peak in one pass: a range under 2 bounds the variance below 1,
+    # and a range within 2000 rules out any sample-to-sample jump above 2000
+    ptp = float(seg.max() - seg.min())
+    if ptp < 2:
         return True
 
-    # 2. Clipping / saturation check (too many identical values)
-    unique_ratio = len(np.unique(seg)) / len(seg)
-    if unique_ratio < 0.02:
+    # 1. Flatline / low variance check (variance from one sum + dot pass,
+    # accumulated in float64 so large ADC offsets don't swamp the variance)
+    mean = seg.sum(dtype=np.float64) / n
+    if np.einsum("i,i->", seg, seg, dtype=np.float64) / n - mean * mean < 1.0:
         return True
 
-    # 3. Extreme jump check
-    if np.max(np.abs(np.diff(seg))) > 2000:
+    if diff_buf is None:
+        diff_buf = np.empty(n - 1, dtype=np.float32)
+
+    # 2. Extreme jump check (cheap, so run it before the sort below)
+    if ptp > 2000:
+        np.subtract(seg[1:], seg[:-1], out=diff_buf)
+        if np.abs(diff_buf, out=diff_buf).max() > 2000:
+            return True
+
+    # 3. Clipping / saturation check (too many identical values):
+    # distinct values = nonzero steps between neighbours in sorted order
+    srt = np.sort(seg, kind="quicksort")
+    np.subtract(srt[1:], srt[:-1], out=diff_buf)
+    unique_count = np.count_nonzero(diff_buf) + 1
+    if unique_count / n < 0.02:
         return True
 
     # 4. Peak plausibility check (very rough)
+    return is_peak_count_implausible(seg, sampling_rate)
+
+
+def is_peak_count_implausible(segment: np.ndarray, sampling_rate: float) -> bool:
+    """
+    Rough peak plausibility check for a 3-second segment.
+
+    Args:
+        segment: Numpy array of PPG values for a 3-second segment
+        sampling_rate: Sampling rate in Hz
+
+    Returns:
+        True if the detected peak count is outside the expected range
+    """
     try:
-        peaks, _ = nk.ppg_peaks(seg, sampling_rate=sampling_rate)
+        # Cheap count first: cached bandpass + scipy peak finder
+        filtered = sosfiltfilt(get_bandpass_sos(sampling_rate), segment)
+        fast_peaks, _ = find_peaks(
+            filtered,
+            distance=max(1, int(0.4 * sampling_rate)),
+            prominence=np.std(filtered),
+        )
+        peak_count = len(fast_peaks)
+
+        # For 3s segment, expect roughly 2-6 peaks at 40-120 bpm
+        if 2 <= peak_count <= 6:
+            return False
+        if peak_count < 1 or peak_count > 7:
+            return True
+
+        # Borderline count (one off the range): let neurokit decide
+        peaks, _ = nk.ppg_peaks(
+            np.asarray(segment, dtype=np.float32), sampling_rate=sampling_rate
+        )
         if "PPG_Peaks" in peaks:
             peak_count = int(np.sum(peaks["PPG_Peaks"]))
         else:
             peak_count = 0
 
-        # For 3s segment, expect roughly 2-6 peaks at 40-120 bpm
         if peak_count < 2 or peak_count > 6:
             return True
     except Exception:
@@ -213,17 +356,59 @@ def analyze_window_quality(
     bad_segments = 0
     total_segments = len(ppg_window) // seg_len
 
+    # Numeric checks for every segment in one compiled pass (int16 or float32)
+    ppg = np.ascontiguousarray(ppg_window)
+    numeric_bad = find_bad_segments(ppg, seg_len)
+
     for i in range(total_segments):
         start = i * seg_len
         end = start + seg_len
-        segment = ppg_window[start:end]
-        if is_segment_bad(segment, sampling_rate):
+        if numeric_bad[i] or is_peak_count_implausible(ppg[start:end], sampling_rate):
             bad_segments += 1
             if bad_segments > max_bad_segments:
                 return True, bad_segments
 
     return False, bad_segments
 
+def rmssd_from_peaks(peak_indices, sampling_rate=100):
+    """
+    Calculate RMSSD from peak sample indices.
+
+    Args:
+        peak_indices: Sorted peak indices (at least 3)
+        sampling_rate: Sampling rate in Hz
+
+    Returns:
+        RMSSD value in milliseconds
+    """
+    peaks = np.asarray(peak_indices, dtype=np.int64)
+    return float(rmssd_ms(peaks, float(sampling_rate)))
+
+
+def fast_rmssd(ppg_window, sampling_rate=100):
+    """
+    RMSSD from the same cleaning and peaks as nk.ppg_process, without the
+    rate and signal quality columns it also computes.
+
+    Args:
+        ppg_window: Array of PPG signal values
+        sampling_rate: Sampling rate in Hz
+
+    Returns:
+        RMSSD value in milliseconds, or None if fewer than 3 peaks remain
+        after clean_peaks
+    """
+    ppg = np.asarray(ppg_window, dtype=np.float32)
+    cleaned = sosfiltfilt(get_ppg_clean_sos(sampling_rate), ppg)
+    _, info = nk.ppg_peaks(cleaned, sampling_rate=sampling_rate)
+
+    cleaned_peaks = clean_peaks(ppg_window, info["PPG_Peaks"])
+    if len(cleaned_peaks) < 3:
+        return None
+
+    return rmssd_from_peaks(cleaned_peaks, sampling_rate)
+
+
 def calculate_hrv_rmssd(ppg_window, sampling_rate=100):
     """
     Calculate HRV using RMSSD (Root Mean Square of Successive Differences) from PPG signal.
@@ -236,33 +421,52 @@ def calculate_hrv_rmssd(ppg_window, sampling_rate=100):
         RMSSD value in milliseconds, or None if calculation fails
     """
     try:
-        signals, info = nk.ppg_process(ppg_window, sampling_rate=sampling_rate)
+        return fast_rmssd(ppg_window, sampling_rate)
+    except Exception as e:
+        return None
 
-        # Detect raw peaks
-        if 'PPG_Peaks' in signals:
-            peaks_indices = np.where(signals['PPG_Peaks'] == 1)[0]
-        else:
-            peaks_indices = np.array([])
 
-        # Clean the peaks
-        cleaned_peaks = clean_peaks(ppg_window, peaks_indices)
+def to_adc_array(ppg_data):
+    """
+    Convert request PPG samples to an array at native ADC precision.
 
-        # Create a new PPG_Peaks array with only cleaned peaks
-        ppg_peaks_clean = np.zeros(len(ppg_window), dtype=int)
-        for idx in cleaned_peaks:
-            if 0 <= idx < len(ppg_peaks_clean):
-                ppg_peaks_clean[idx] = 1
+    Args:
+        ppg_data: List of PPG signal values
 
-        # Replace the peaks in the signals DataFrame
-        signals['PPG_Peaks'] = ppg_peaks_clean
+    Returns:
+        int16 array if every sample is an integer in int16 range (raw ADC
+        counts), otherwise a float32 array
+    """
+    ppg_float = np.asarray(ppg_data, dtype=np.float32)
+    ppg_int = ppg_float.astype(np.int16)
+    if np.array_equal(ppg_int, ppg_float):
+        return ppg_int
+    return ppg_float
 
-        # Now calculate HRV using only the cleaned peaks
-        hrv_metrics = nk.ppg_intervalrelated(signals, sampling_rate=sampling_rate)
-        rmssd = hrv_metrics['HRV_RMSSD'].values[0]
 
-        return float(rmssd)
-    except Exception as e:
-        return None
+def run_analysis_pipeline(ppg_array, sampling_rate, max_bad_segments):
+    """
+    Signal quality check followed by RMSSD calculation, run in a worker process.
+
+    Args:
+        ppg_array: Array of PPG signal values
+        sampling_rate: Sampling rate in Hz
+        max_bad_segments: Maximum number of bad segments allowed
+
+    Returns:
+        Tuple of (is_bad, bad_segments_count, rmssd); rmssd is None if the
+        window was rejected or the calculation failed
+    """
+    is_bad, bad_segments = analyze_window_quality(
+        ppg_array,
+        sampling_rate,
+        segment_sec=3,
+        max_bad_segments=max_bad_segments,
+    )
+    if is_bad:
+        return True, bad_segments, None
+
+    return False, bad_segments, calculate_hrv_rmssd(ppg_array, sampling_rate)
 
 
 @app.get("/")
@@ -314,7 +518,7 @@ async def analyze_hrv(request: HRVRequest):
     Raises:
         HTTPException (422): If signal quality is too poor or HRV calculation fails
     """
-    ppg_array = np.array(request.ppg_data)
+    ppg_array = to_adc_array(request.ppg_data)
 
     # Minimum data length check (at least 10 seconds)
     min_samples = int(request.sampling_rate * 10)
@@ -331,11 +535,14 @@ async def analyze_hrv(request: HRVRequest):
             },
         )
 
-    is_bad, bad_segments = analyze_window_quality(
+    # CPU-bound SQI + HRV work runs in the process pool, off the event loop
+    loop = asyncio.get_running_loop()
+    is_bad, bad_segments, rmssd = await loop.run_in_executor(
+        app.state.pool,
+        run_analysis_pipeline,
         ppg_array,
         request.sampling_rate,
-        segment_sec=3,
-        max_bad_segments=request.max_bad_segments,
+        request.max_bad_segments,
     )
 
     if is_bad:
@@ -352,8 +559,6 @@ async def analyze_hrv(request: HRVRequest):
             },
         )
 
-    rmssd = calculate_hrv_rmssd(ppg_array, request.sampling_rate)
-
     if rmssd is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -483,6 +688,7 @@ class AmplitudeSession:
     def __init__(self):
         self.ppg_buffer: deque = deque(maxlen=AMP_BUFFER_SAMPLES)
         self.segment_buffer: deque = deque(maxlen=AMP_SEGMENT_SAMPLES)
+        self.diff_buf = np.empty(AMP_SEGMENT_SAMPLES - 1, dtype=np.float32)
         self.tracker = RealTimeHRVAmplitude()
         self.hr_times: List[float] = []
         self.hr_values: List[float] = []
@@ -572,10 +778,10 @@ async def amplitude_data(request: AmplitudeDataRequest):
 
         # SQI check on every sample once segment buffer is full
         if len(session.segment_buffer) == AMP_SEGMENT_SAMPLES:
-            seg = np.array(session.segment_buffer)
+            seg = np.array(session.segment_buffer, dtype=np.float32)
             t = session.sample_count / AMP_SAMPLING_RATE
 
-            if is_segment_bad(seg, AMP_SAMPLING_RATE):
+            if is_segment_bad(seg, AMP_SAMPLING_RATE, session.diff_buf):
                 if not session.is_paused:
                     session.is_paused = True
                     session.tracker.paused = True
@@ -700,4 +906,7 @@ async def amplitude_stop(request: AmplitudeStopRequest):
 if __name__ == "__main__":
     import uvicorn
 
+    # Needed for the process pool in the PyInstaller .exe build
+    multiprocessing.freeze_support()
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,120 @@
+"""
+Numba kernels for the segment Signal Quality Index (SQI) checks and RMSSD.
+
+The numeric checks from is_segment_bad (flatline, clipping, extreme jump)
+are fused into a single compiled pass over the whole window so the API
+doesn't pay Python/NumPy dispatch overhead for every 3-second segment.
+
+When the AOT build from build_sqi_native.py is importable, find_bad_segments
+and rmssd_ms call it directly instead of JIT-compiling at startup.
+"""
+
+import math
+
+import numpy as np
+from numba import njit
+
+try:
+    import sqi_native
+except ImportError:  # not built on this machine, use the JIT kernels
+    sqi_native = None
+
+
+@njit(cache=True, fastmath=True)
+def bad_segment_mask(ppg, seg_len):
+    """
+    Flag segments that fail the numeric SQI checks.
+
+    Args:
+        ppg: Contiguous int16 or float32 array of PPG values for the whole window
+        seg_len: Number of samples per segment
+
+    Returns:
+        Boolean array with one entry per full segment, True if the segment is bad
+    """
+    n_seg = ppg.size // seg_len
+    bad = np.zeros(n_seg, dtype=np.bool_)
+
+    for i in range(n_seg):
+        s0 = i * seg_len
+        total = 0.0
+        total_sq = 0.0
+        max_jump = 0.0
+        prev = ppg[s0]
+
+        for j in range(s0, s0 + seg_len):
+            v = ppg[j]
+            total += v
+            total_sq += v * v
+            jump = abs(v - prev)
+            if jump > max_jump:
+                max_jump = jump
+            prev = v
+
+        # 1. Flatline / low variance, 3. Extreme jump
+        mean = total / seg_len
+        if total_sq / seg_len - mean * mean < 1.0 or max_jump > 2000.0:
+            bad[i] = True
+            continue
+
+        # 2. Clipping / saturation (count distinct values in a sorted copy)
+        srt = np.sort(ppg[s0:s0 + seg_len])
+        unique_count = 1
+        for j in range(1, seg_len):
+            if srt[j] != srt[j - 1]:
+                unique_count += 1
+        if unique_count / seg_len < 0.02:
+            bad[i] = True
+
+    return bad
+
+
+@njit(cache=True, fastmath=True)
+def rmssd_from_peak_indices(peak_idx, sampling_rate):
+    """
+    One-pass RMSSD from peak indices without temporary IBI arrays.
+
+    Args:
+        peak_idx: int64 array of sorted peak sample indices (at least 3)
+        sampling_rate: Sampling rate in Hz
+
+    Returns:
+        RMSSD value in milliseconds
+    """
+    ms_per_sample = 1000.0 / sampling_rate
+    prev_ibi = (peak_idx[1] - peak_idx[0]) * ms_per_sample
+    acc = 0.0
+    count = 0
+    for i in range(2, peak_idx.size):
+        ibi = (peak_idx[i] - peak_idx[i - 1]) * ms_per_sample
+        d = ibi - prev_ibi
+        acc += d * d
+        count += 1
+        prev_ibi = ibi
+    return math.sqrt(acc / count)
+
+
+def find_bad_segments(ppg, seg_len):
+    """bad_segment_mask via the AOT build when it has a matching signature."""
+    if sqi_native is not None:
+        if ppg.dtype == np.int16:
+            return sqi_native.bad_segment_mask_i2(ppg, seg_len)
+        if ppg.dtype == np.float32:
+            return sqi_native.bad_segment_mask_f4(ppg, seg_len)
+    return bad_segment_mask(ppg, seg_len)
+
+
+def rmssd_ms(peak_idx, sampling_rate):
+    """rmssd_from_peak_indices via the AOT build when it is available."""
+    if sqi_native is not None:
+        return sqi_native.rmssd_from_peak_indices(peak_idx, sampling_rate)
+    return rmssd_from_peak_indices(peak_idx, sampling_rate)
+
+
+def warm_up():
+    """Compile (or load from cache) the kernels before the first request."""
+    if sqi_native is not None:
+        return
+    bad_segment_mask(np.zeros(4, dtype=np.int16), 2)
+    bad_segment_mask(np.zeros(4, dtype=np.float32), 2)
+    rmssd_from_peak_indices(np.arange(3, dtype=np.int64), 100.0)
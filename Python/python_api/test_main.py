@@ -0,0 +1,57 @@
+"""
+Tests for the RMSSD path in main.py
+
+Run from this directory:
+    python -m pytest test_main.py
+"""
+
+import neurokit2 as nk
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+SAMPLING_RATE = 100
+WINDOW = 30 * SAMPLING_RATE
+
+
+def neurokit_rmssd(ppg_window, sampling_rate):
+    """Reference RMSSD: nk.ppg_process peaks, clean_peaks, then nk.hrv_time"""
+    signals, _ = nk.ppg_process(np.asarray(ppg_window, dtype=np.float32), sampling_rate=sampling_rate)
+    peaks = main.clean_peaks(ppg_window, np.flatnonzero(signals['PPG_Peaks'].to_numpy()))
+    return nk.hrv_time(peaks, sampling_rate=sampling_rate)['HRV_RMSSD'].values[0]
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('adc_counts', [False, True], ids=['float', 'adc'])
+def test_rmssd_matches_neurokit_on_synthetic_ppg(seed, adc_counts):
+    ppg = nk.ppg_simulate(duration=120, sampling_rate=SAMPLING_RATE, heart_rate=70, random_state=seed)
+    if adc_counts:
+        ppg = np.round(ppg * 200 + 2000)
+    ppg = main.to_adc_array(ppg.tolist())
+
+    for start in range(0, len(ppg) - WINDOW + 1, 500):
+        ppg_window = ppg[start:start + WINDOW]
+        expected = neurokit_rmssd(ppg_window, SAMPLING_RATE)
+        assert main.calculate_hrv_rmssd(ppg_window, SAMPLING_RATE) == pytest.approx(expected, abs=1e-6), start
+
+
+def test_analyze_runs_through_the_worker_pool(monkeypatch):
+    monkeypatch.setenv('HRV_WORKERS', '2')
+    ppg = nk.ppg_simulate(duration=30, sampling_rate=SAMPLING_RATE, heart_rate=70, random_state=0)
+    ppg_data = np.round(ppg * 200 + 2000).tolist()
+
+    with TestClient(main.app) as client:
+        assert main.app.state.pool._max_workers == 2
+        response = client.post('/analyze', json={'ppg_data': ppg_data, 'sampling_rate': SAMPLING_RATE})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body['success'] is True
+    assert body['rmssd'] == pytest.approx(neurokit_rmssd(main.to_adc_array(ppg_data), SAMPLING_RATE), abs=1e-6)
+
+
+def test_worker_count_is_capped_by_default(monkeypatch):
+    monkeypatch.delenv('HRV_WORKERS', raising=False)
+    assert 1 <= main._get_worker_count() <= 4
@@ -1,5 +1,4 @@
 import time
-from collections import deque
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
@@ -12,83 +11,114 @@ SAMPLING_RATE = 100
 WINDOW_SECONDS = 30
 WINDOW_SAMPLES = SAMPLING_RATE * WINDOW_SECONDS
 
-# Rolling window for signal
-ppg_window = deque(maxlen=WINDOW_SAMPLES)
+# x positions are fixed, so build them once
+X = np.arange(WINDOW_SAMPLES)
+
+# Rolling window for signal (ring buffer: write position + number of valid samples)
+ring = np.empty(WINDOW_SAMPLES, dtype=np.float32)
+write_pos = 0
+filled = 0
 
 # Track total samples read (absolute index)
 total_samples = 0
 
-# Peak indices (absolute indices)
-peak_indices = []
+# Peak indices (absolute indices, kept sorted)
+peak_indices = np.empty(0, dtype=np.int64)
 
 # File read positions
 ppg_pos = 0
 peaks_pos = 0
 
+# Padding above/below the signal; y-limits are set from the first data read
+Y_MARGIN = 50
+y_fitted = False
+
 
+# Returns the complete lines appended since last_pos as one raw byte buffer
 def read_new_lines(path, last_pos):
     if not path.exists():
-        return [], last_pos
-    with path.open("r") as f:
+        return b"", last_pos
+    with path.open("rb") as f:
         f.seek(last_pos)
-        lines = f.readlines()
-        last_pos = f.tell()
-    return lines, last_pos
+        buf = f.read()
+    # Leave a partially written last line for the next read
+    end = buf.rfind(b"\n") + 1
+    return buf[:end], last_pos + end
+
+
+# Parses a newline-separated buffer in one NumPy call, skipping bad lines if needed
+def parse_values(buf, dtype):
+    try:
+        return np.fromstring(buf, dtype=dtype, sep="\n")
+    except ValueError:
+        values = []
+        for line in buf.split(b"\n"):
+            try:
+                values.append(float(line))
+            except ValueError:
+                continue
+        return np.array(values, dtype=dtype)
 
 
 def update(_):
-    global ppg_pos, peaks_pos, total_samples, peak_indices
+    global ppg_pos, peaks_pos, total_samples, peak_indices, write_pos, filled
 
     # Read new PPG samples
-    ppg_lines, ppg_pos = read_new_lines(PPG_FILE, ppg_pos)
-    for line in ppg_lines:
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            val = float(line)
-        except ValueError:
-            continue
-        ppg_window.append(val)
-        total_samples += 1
+    ppg_buf, ppg_pos = read_new_lines(PPG_FILE, ppg_pos)
+    if ppg_buf:
+        values = parse_values(ppg_buf, np.float32)
+        total_samples += values.size
+
+        # Copy into the ring buffer in at most two slices
+        values = values[-WINDOW_SAMPLES:]
+        k = values.size
+        tail = min(k, WINDOW_SAMPLES - write_pos)
+        ring[write_pos:write_pos + tail] = values[:tail]
+        ring[:k - tail] = values[tail:]
+        write_pos = (write_pos + k) % WINDOW_SAMPLES
+        filled = min(filled + k, WINDOW_SAMPLES)
 
     # Read new peak indices
-    peak_lines, peaks_pos = read_new_lines(PEAKS_FILE, peaks_pos)
-    for line in peak_lines:
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            idx = int(line)
-        except ValueError:
-            continue
-        peak_indices.append(idx)
+    peak_buf, peaks_pos = read_new_lines(PEAKS_FILE, peaks_pos)
+    if peak_buf:
+        peak_indices = np.sort(np.concatenate((peak_indices, parse_values(peak_buf, np.int64))))
 
     # Prune old peak indices to keep memory small
-    if len(ppg_window) > 0:
-        start_index = total_samples - len(ppg_window)
-        peak_indices = [i for i in peak_indices if i >= start_index]
+    if filled > 0:
+        start_index = total_samples - filled
+        peak_indices = peak_indices[np.searchsorted(peak_indices, start_index):]
 
     # Update plot
-    if len(ppg_window) == 0:
+    if filled == 0:
         return line_plot, peak_plot
 
-    y = np.array(ppg_window)
-    x = np.arange(len(y))
+    # Oldest-to-newest view of the ring buffer
+    if filled < WINDOW_SAMPLES:
+        y = ring[:filled]
+    else:
+        y = np.concatenate((ring[write_pos:], ring[:write_pos]))
 
-    line_plot.set_data(x, y)
+    line_plot.set_data(X[:len(y)], y)
 
     # Plot peaks within the current window
-    start_index = total_samples - len(ppg_window)
-    in_window = [i for i in peak_indices if start_index <= i < start_index + len(ppg_window)]
-    peak_x = np.array([i - start_index for i in in_window], dtype=int)
+    start_index = total_samples - filled
+    lo, hi = np.searchsorted(peak_indices, [start_index, start_index + filled])
+    peak_x = peak_indices[lo:hi] - start_index
     peak_y = y[peak_x] if len(peak_x) else np.array([])
 
     peak_plot.set_data(peak_x, peak_y)
 
-    ax.set_xlim(0, max(len(y), 1))
-    if len(y) > 0:
-        ax.set_ylim(y.min() - 50, y.max() + 50)
+    # Axis limits stay fixed so blitting only redraws the lines; fit them to the
+    # first data, then rescale (full redraw) only when the signal leaves the
+    # y-range or shrinks to well under it
+    global y_fitted
+    y_lo, y_hi = ax.get_ylim()
+    y_min, y_max = y.min(), y.max()
+    if (not y_fitted or y_min < y_lo or y_max > y_hi
+            or 4 * (y_max - y_min + 2 * Y_MARGIN) < y_hi - y_lo):
+        ax.set_ylim(y_min - Y_MARGIN, y_max + Y_MARGIN)
+        y_fitted = True
+        fig.canvas.draw_idle()
 
     return line_plot, peak_plot
 
@@ -104,6 +134,8 @@ ax.set_title("PPG Window Data (Real-Time) with Peaks")
 ax.set_xlabel("Samples (window)")
 ax.set_ylabel("PPG Value")
 
+ax.set_xlim(0, WINDOW_SAMPLES)
+
 line_plot, = ax.plot([], [], color="blue", linewidth=1)
 peak_plot, = ax.plot([], [], "ro", markersize=4)
 
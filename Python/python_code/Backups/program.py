@@ -1,16 +1,31 @@
 import serial
 import serial.tools.list_ports
+import sys
 import time
 import re
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from collections import deque
+from pathlib import Path
 import numpy as np
 import neurokit2 as nk
+from scipy.signal import butter, sosfiltfilt
 import warnings
 
 # Suppress all warnings from neurokit2 and pandas
 warnings.filterwarnings('ignore')
 
+# Serial format, must match PPG_BINARY_FRAMES in Arduino/arduino_code/test/ppg_sensor_only.cpp:
+# False for one ASCII line per sample (the firmware default), True for 2-byte frames
+BINARY_FRAMES = False
+
+# Set on the first byte of each 2-byte sample frame, clear on the second
+FRAME_SYNC = 0x80
+
+# Fallback for lines that aren't a bare number (e.g. debug text from the Arduino)
+PPG_RE = re.compile(rb'(\d+)')
+
 def list_available_ports():
     """List all available serial ports"""
     ports = serial.tools.list_ports.comports()
@@ -65,18 +80,86 @@ def get_user_input():
 
 
 def parse_ppg_signal(line):
-    """Extract PPG signal value from serial line"""
-    # Format: 438
-    ppg_match = re.search(r'(\d+)', line)
-    if ppg_match:
-        return int(ppg_match.group(1))
-    return None
+    """Extract PPG signal value from a raw serial line (bytes)"""
+    # Format: 438 -- int() accepts bytes and ignores the surrounding whitespace/CRLF
+    try:
+        return int(line)
+    except ValueError:
+        ppg_match = PPG_RE.search(line)
+        if ppg_match:
+            return int(ppg_match.group(1))
+        return None
+
+
+# Bandpass filter coefficients keyed by sampling rate
+_sos_cache = {}
+
+
+def get_bandpass_sos(sampling_rate):
+    """
+    Get 0.5-8 Hz Butterworth bandpass coefficients, designed once per sampling rate.
+    Same filter nk.ppg_clean designs on every call (default "elgendi" method).
+    """
+    sos = _sos_cache.get(sampling_rate)
+    if sos is None:
+        sos = butter(2, [0.5, 8], btype='bandpass', fs=sampling_rate, output='sos')
+        _sos_cache[sampling_rate] = sos
+    return sos
+
+
+def serial_reader(ser, samples, stop_event):
+    """
+    Read PPG values from serial until stop_event is set (runs on its own thread)
+    
+    Args:
+        ser: Open serial port
+        samples: Queue that each parsed PPG value is put on
+        stop_event: threading.Event that ends the loop
+    """
+    # Bytes read from serial that don't make a whole line (or frame) yet
+    rx_buf = bytearray()
+    
+    while not stop_event.is_set():
+        # Blocking read instead of polling in_waiting: returns once 256 bytes
+        # have arrived or the port timeout runs out, with whatever came in
+        try:
+            data = ser.read(256)
+        except Exception:
+            return  # Port closed or unplugged
+        if not data:
+            continue
+        rx_buf += data
+        
+        if not BINARY_FRAMES:
+            # Keep the trailing partial line for the next read
+            *lines, rx_buf = rx_buf.split(b'\n')
+            for line in lines:
+                ppg_value = parse_ppg_signal(line)
+                if ppg_value is not None:
+                    samples.put(ppg_value)
+            continue
+        
+        # A frame is a sync byte followed by a non-sync byte. Stray bytes (joined
+        # mid-frame or a byte lost on the wire) match no frame and are skipped, so
+        # the stream realigns at the next frame without losing the good ones
+        buf = np.frombuffer(bytes(rx_buf), dtype=np.uint8)
+        is_sync = buf >= FRAME_SYNC
+        starts = np.flatnonzero(is_sync[:-1] & ~is_sync[1:])
+        vals = ((buf[starts] & 0x7F).astype(np.uint16) << 7) | buf[starts + 1]
+        
+        # Keep a trailing sync byte, its second half comes with the next read
+        del rx_buf[:len(buf) - int(is_sync[-1])]
+        for ppg_value in vals.tolist():
+            samples.put(ppg_value)
 
 
 def calculate_hrv_rmssd(ppg_window, sampling_rate=100):
     """
     Calculate HRV using RMSSD from PPG signal
     
+    Each window is processed in full with the same cleaning and peaks as
+    nk.ppg_process, skipping the rate and signal quality columns it also computes.
+    
     Args:
         ppg_window: Array of PPG signal values
         sampling_rate: Sampling rate in Hz (default 100)
@@ -91,32 +174,38 @@ def calculate_hrv_rmssd(ppg_window, sampling_rate=100):
     ppg_window_data_combined.append(np.array(ppg_window))
 
     try:
-        # Process PPG signal to extract heart rate variability
-        signals, info = nk.ppg_process(ppg_window, sampling_rate=sampling_rate)
-        
-        # Calculate HRV metrics
-        hrv_metrics = nk.ppg_intervalrelated(signals, sampling_rate=sampling_rate)
-        
-        # Extract RMSSD (Root Mean Square of Successive Differences)
-        rmssd = hrv_metrics['HRV_RMSSD'].values[0]
-
-        # Deal with the peaks
-        if 'PPG_Peaks' in signals:
-            peaks_indices = np.where(signals['PPG_Peaks'] == 1)[0]
-        else:
-            peaks_indices = np.array([])
+        cleaned = sosfiltfilt(get_bandpass_sos(sampling_rate), ppg_window)
+        _, info = nk.ppg_peaks(cleaned, sampling_rate=sampling_rate)
+        peaks = np.asarray(info["PPG_Peaks"], dtype=np.int64)
 
         # append peak indices after the last index in ppg_window_combined_data
         offset = len(ppg_window)
-        peaks_indices = [i + offset for i in peaks_indices]
-        ppg_peaks_data_combined.extend(peaks_indices)
+        ppg_peaks_data_combined.extend((peaks + offset).tolist())
+        
+        if len(peaks) < 3:
+            return None
         
-        return rmssd
+        # RMSSD (Root Mean Square of Successive Differences) of the inter-beat intervals
+        ibi_ms = np.diff(peaks) / sampling_rate * 1000
+        return float(np.sqrt(np.mean(np.diff(ibi_ms) ** 2)))
     except Exception as e:
         print(f"\n[WARNING] HRV calculation failed: {e}")
         return None
 
 
+def analyze_window(ppg_window, sampling_rate):
+    """
+    Segment SQI check, then RMSSD for one window (runs on the HRV worker thread)
+    
+    Returns:
+        (window_bad, rmssd) - rmssd is None if the window is bad or the calculation fails
+    """
+    # Segment-based quality check (10 x 3s segments)
+    if is_window_bad(ppg_window, sampling_rate, segment_sec=3, max_bad_segments=0):
+        return True, None
+    return False, calculate_hrv_rmssd(ppg_window, sampling_rate)
+
+
 def check_hrv_status(current_rmssd, previous_rmssd):
     """
     Determine HRV status based on change from previous measurement
@@ -128,26 +217,22 @@ def check_hrv_status(current_rmssd, previous_rmssd):
     
     Args:
         current_rmssd: Current window RMSSD value
-        previous_rmssd: Previous window RMSSD value
+        previous_rmssd: Previous window RMSSD value (not None)
     
     Returns:
         Integer: 0, 1, or 2 representing status
     """
-    if previous_rmssd is None or current_rmssd is None:
-        return 1  # Default to yellow if no previous data
-    
-    # Calculate change (current - previous)
+    # GREEN for change >= 0, +1 for any drop, +1 more for a drop of 5ms or more
     change = current_rmssd - previous_rmssd
-    
-    if change >= 0:
-        # Improved or stayed the same
-        return 0  # GREEN
-    elif change > -5:
-        # Dropped but less than 5ms
-        return 1  # YELLOW
-    else:
-        # Dropped 5ms or more
-        return 2  # RED
+    return int(change < 0) + int(change <= -5)
+
+
+# Display information for each HRV status
+STATUS_INFO = {
+    0: {"symbol": "✓", "color": "GREEN", "message": "EXCELLENT - HRV IMPROVING"},
+    1: {"symbol": "~", "color": "YELLOW", "message": "GOOD - SLIGHT DECREASE"},
+    2: {"symbol": "✗", "color": "RED", "message": "REFOCUS - SIGNIFICANT DROP"}
+}
 
 
 def display_feedback(status, current_rmssd, previous_rmssd, window_number):
@@ -160,14 +245,7 @@ def display_feedback(status, current_rmssd, previous_rmssd, window_number):
         previous_rmssd: Previous RMSSD value
         window_number: Current window number
     """
-    # Define status information
-    status_info = {
-        0: {"symbol": "✓", "color": "GREEN", "message": "EXCELLENT - HRV IMPROVING"},
-        1: {"symbol": "~", "color": "YELLOW", "message": "GOOD - SLIGHT DECREASE"},
-        2: {"symbol": "✗", "color": "RED", "message": "REFOCUS - SIGNIFICANT DROP"}
-    }
-    
-    info = status_info.get(status, status_info[1])
+    info = STATUS_INFO.get(status, STATUS_INFO[1])
     
     # Calculate change
     if previous_rmssd is not None:
@@ -183,44 +261,70 @@ def display_feedback(status, current_rmssd, previous_rmssd, window_number):
     print(f"{'='*60}")
 
 
-def is_segment_bad(segment, sampling_rate):
-    """
-    Quick SQI checks to detect bad 3s segments.
-    Returns True if the segment is likely corrupted.
-    """
-    if len(segment) == 0:
-        return True
+def dominant_frequency(segs, sampling_rate):
+    """Frequency (Hz) of the strongest component in each mean-removed, windowed segment (last axis)"""
+    n = segs.shape[-1]
+    window = np.hanning(n).astype(segs.dtype)
+    spectrum = np.abs(np.fft.rfft((segs - segs.mean(axis=-1, keepdims=True)) * window, axis=-1))
+    freqs = np.fft.rfftfreq(n, 1 / sampling_rate)
+    return freqs[spectrum.argmax(axis=-1)]
 
-    seg = np.asarray(segment, dtype=float)
 
-    # Flatline / low variance
-    if np.std(seg) < 1.0:
-        return True
-
-    # Clipping / saturation (too many identical values)
-    unique_ratio = len(np.unique(seg)) / len(seg)
-    if unique_ratio < 0.02:
-        return True
-
-    # Extreme jump check
-    if np.max(np.abs(np.diff(seg))) > 2000:  # tweak if needed
-        return True
-
-    # Peak plausibility (very rough)
+def has_plausible_peak_count(seg, sampling_rate):
+    """Peak plausibility (very rough): 2–6 peaks in a 3s segment at 40–120 bpm"""
     try:
         peaks, _ = nk.ppg_peaks(seg, sampling_rate=sampling_rate)
         if "PPG_Peaks" in peaks:
             peak_count = int(np.sum(peaks["PPG_Peaks"]))
         else:
             peak_count = 0
-
-        # For 3s segment, expect roughly 2–6 peaks at 40–120 bpm
-        if peak_count < 2 or peak_count > 6:
-            return True
+        return 2 <= peak_count <= 6
     except Exception:
+        return False
+
+
+def count_bad_segments(segs, sampling_rate, max_bad_segments=0):
+    """
+    Run the SQI checks on every row of segs (segments x samples).
+    Stops counting once more than max_bad_segments are bad.
+    """
+    # Flatline / low variance
+    bad = segs.std(axis=1) < 1.0
+
+    # Clipping / saturation (too many identical values)
+    distinct = 1 + np.count_nonzero(np.diff(np.sort(segs, axis=1), axis=1), axis=1)
+    bad |= distinct / segs.shape[1] < 0.02
+
+    # Extreme jump check
+    bad |= np.abs(np.diff(segs, axis=1)).max(axis=1) > 2000  # tweak if needed
+
+    bad_segments = int(bad.sum())
+    if bad_segments > max_bad_segments or bad.all():
+        return bad_segments
+
+    # Pulse-rate plausibility: dominant frequency of the segment within 40–120 bpm.
+    # Baseline drift or a strong harmonic can out-weigh the pulse in the spectrum,
+    # so count peaks before rejecting a segment outside that range
+    rest = segs[~bad]
+    freqs = dominant_frequency(rest, sampling_rate)
+    for seg in rest[(freqs < 0.67) | (freqs > 2.0)]:
+        if not has_plausible_peak_count(seg, sampling_rate):
+            bad_segments += 1
+            if bad_segments > max_bad_segments:
+                break
+
+    return bad_segments
+
+
+def is_segment_bad(segment, sampling_rate):
+    """
+    Quick SQI checks to detect bad 3s segments.
+    Returns True if the segment is likely corrupted.
+    """
+    if len(segment) == 0:
         return True
 
-    return False
+    return count_bad_segments(np.asarray(segment, dtype=np.float32)[np.newaxis], sampling_rate) > 0
 
 
 def is_window_bad(ppg_window, sampling_rate, segment_sec=3, max_bad_segments=0):
@@ -232,19 +336,13 @@ def is_window_bad(ppg_window, sampling_rate, segment_sec=3, max_bad_segments=0):
     if seg_len <= 0:
         return True
 
-    bad_segments = 0
     total_segments = len(ppg_window) // seg_len
+    if total_segments == 0:
+        return False
 
-    for i in range(total_segments):
-        start = i * seg_len
-        end = start + seg_len
-        segment = ppg_window[start:end]
-        if is_segment_bad(segment, sampling_rate):
-            bad_segments += 1
-            if bad_segments > max_bad_segments:
-                return True
-
-    return False
+    # One row per segment so the checks run on all of them at once
+    segs = np.asarray(ppg_window[:total_segments * seg_len], dtype=np.float32).reshape(total_segments, seg_len)
+    return count_bad_segments(segs, sampling_rate, max_bad_segments) > max_bad_segments
 
 
 def collect_and_analyze_hrv(serial_port, duration, baud_rate=9600):
@@ -263,7 +361,8 @@ def collect_and_analyze_hrv(serial_port, duration, baud_rate=9600):
     
     try:
         # Open serial connection
-        ser = serial.Serial(serial_port, baud_rate, timeout=1)
+        # Short timeout so the reader thread's blocking read() checks for stop regularly
+        ser = serial.Serial(serial_port, baud_rate, timeout=0.05)
         time.sleep(2)  # Wait for Arduino to reset
         
         print(f"\n{'='*60}")
@@ -279,7 +378,10 @@ def collect_and_analyze_hrv(serial_port, duration, baud_rate=9600):
         print("\nCollecting initial data (30 seconds)...\n")
         
         # Data collection
-        ppg_buffer = deque(maxlen=window_size_samples)  # Sliding window
+        # Sliding window as a preallocated ring buffer (write_pos is the oldest sample once full)
+        ppg_ring = np.empty(window_size_samples, dtype=np.int32)
+        write_pos = 0
+        filled = 0
         global all_ppg_data
         all_ppg_data = []  # Store all data
         global ppg_window_data_combined
@@ -288,6 +390,7 @@ def collect_and_analyze_hrv(serial_port, duration, baud_rate=9600):
         global ppg_peaks_data_combined
         ppg_peaks_data_combined = []  # Store peaks data for analysis
         
+        
         last_calculation_time = 0.0
         previous_rmssd = None
         window_count = 0
@@ -296,68 +399,108 @@ def collect_and_analyze_hrv(serial_port, duration, baud_rate=9600):
         # Track status counts for summary
         status_counts = {0: 0, 1: 0, 2: 0}
         
-        while True:
-            # Read PPG data from serial
-            if ser.in_waiting > 0:
-                try:
-                    line = ser.readline().decode('utf-8', errors='replace').strip()
-                    
-                    # Extract PPG signal
-                    ppg_value = parse_ppg_signal(line)
-                    
-                    if ppg_value is not None:
-                        ppg_buffer.append(ppg_value)
-                        all_ppg_data.append(ppg_value)
-                        sample_count += 1
-                        
-                        # Print progress
-                        if sample_count % 100 == 0:
-                            data_time = sample_count / SAMPLING_RATE
-                            print(f"Samples collected: {sample_count} | Time: {data_time:.1f}s", end='\r')
+        show_progress = sys.stdout.isatty()
+        last_progress_time = 0.0
+        
+        def report(window_number, result):
+            nonlocal previous_rmssd
+            window_bad, current_rmssd = result
+            if window_bad:
+                print(f"\n[Window #{window_number}] Bad data detected (segment SQI). Skipping HRV.")
+            elif current_rmssd is not None:
+                # Check HRV status (yellow until there's a previous reading to compare)
+                if previous_rmssd is None:
+                    status = 1
+                else:
+                    status = check_hrv_status(current_rmssd, previous_rmssd)
                 
-                except Exception:
-                    continue
-            
-            # Use data-derived time so windows align with samples
-            data_time = sample_count / SAMPLING_RATE
-            
-            # Perform HRV calculation every 10 seconds (after initial 30 seconds)
-            if (data_time >= WINDOW_SIZE_SEC and 
-                data_time - last_calculation_time >= UPDATE_INTERVAL_SEC and
-                len(ppg_buffer) >= window_size_samples * 0.8):  # Allow 20% tolerance
+                # Track status
+                status_counts[status] += 1
                 
-                window_count += 1
-                last_calculation_time = data_time
+                # Display feedback
+                display_feedback(status, current_rmssd, previous_rmssd, window_number)
                 
-                # Calculate HRV for current window
-                ppg_window = np.array(ppg_buffer)
-
-                # Segment-based quality check (10 x 3s segments)
-                if is_window_bad(ppg_window, SAMPLING_RATE, segment_sec=3, max_bad_segments=0):
-                    print(f"\n[Window #{window_count}] Bad data detected (segment SQI). Skipping HRV.")
-                    continue
-
-                current_rmssd = calculate_hrv_rmssd(ppg_window, SAMPLING_RATE)
+                # Update previous RMSSD
+                previous_rmssd = current_rmssd
+            else:
+                print(f"\n[Window #{window_number}] Unable to calculate HRV")
+        
+        # Serial reading runs on its own thread so HRV calculations don't hold up the port
+        samples = queue.SimpleQueue()
+        stop_reading = threading.Event()
+        reader = threading.Thread(target=serial_reader, args=(ser, samples, stop_reading), daemon=True)
+        reader.start()
+        
+        # SQI + HRV run on a worker thread so the main loop keeps taking samples;
+        # pending holds (window number, future) for the window in flight
+        pending = None
+        
+        with ThreadPoolExecutor(max_workers=1) as hrv_pool:
+            while True:
+                # Report the window in flight as soon as it's done
+                if pending is not None and pending[1].done():
+                    report(pending[0], pending[1].result())
+                    pending = None
                 
-                if current_rmssd is not None:
-                    # Check HRV status
-                    status = check_hrv_status(current_rmssd, previous_rmssd)
+                # One sample per pass so windows still trigger on the exact sample
+                try:
+                    ppg_value = samples.get(timeout=0.1)
+                except queue.Empty:
+                    ppg_value = None
+                    if not reader.is_alive():
+                        print("\n\nSerial connection lost!")
+                        break
+                
+                if ppg_value is not None:
+                    ppg_ring[write_pos] = ppg_value
+                    write_pos = (write_pos + 1) % window_size_samples
+                    if filled < window_size_samples:
+                        filled += 1
+                    all_ppg_data.append(ppg_value)
+                    sample_count += 1
                     
-                    # Track status
-                    status_counts[status] += 1
+                    # Print progress once a second (terminal only, it's just noise in a piped log)
+                    now = time.monotonic()
+                    if show_progress and now - last_progress_time >= 1.0:
+                        last_progress_time = now
+                        print("Samples collected: %d | Time: %.1fs" % (sample_count, sample_count / SAMPLING_RATE), end='\r')
+                
+                # Use data-derived time so windows align with samples
+                data_time = sample_count / SAMPLING_RATE
+                
+                # Perform HRV calculation every 10 seconds (after initial 30 seconds)
+                if (data_time >= WINDOW_SIZE_SEC and 
+                    data_time - last_calculation_time >= UPDATE_INTERVAL_SEC and
+                    filled >= window_size_samples * 0.8):  # Allow 20% tolerance
                     
-                    # Display feedback
-                    display_feedback(status, current_rmssd, previous_rmssd, window_count)
+                    window_count += 1
+                    last_calculation_time = data_time
                     
-                    # Update previous RMSSD
-                    previous_rmssd = current_rmssd
-                else:
-                    print(f"\n[Window #{window_count}] Unable to calculate HRV")
+                    # Windows are reported in order: finish the previous one first
+                    if pending is not None:
+                        report(pending[0], pending[1].result())
+                    
+                    # Copy of the window in oldest-to-newest order so the ring buffer can keep filling
+                    if filled < window_size_samples:
+                        ppg_window = ppg_ring[:filled].copy()
+                    else:
+                        ppg_window = np.concatenate((ppg_ring[write_pos:], ppg_ring[:write_pos]))
+                    pending = (window_count, hrv_pool.submit(analyze_window, ppg_window, SAMPLING_RATE))
+                
+                # Stop after all due windows are computed
+                if data_time >= duration:
+                    if pending is not None:
+                        report(pending[0], pending[1].result())
+                        pending = None
+                    print("\n\nRecording complete!")
+                    break
             
-            # Stop after all due windows are computed
-            if data_time >= duration:
-                print("\n\nRecording complete!")
-                break
+            if pending is not None:
+                report(pending[0], pending[1].result())
+        
+        # Stop the reader before closing the port under it
+        stop_reading.set()
+        reader.join()
         
         # Close serial connection
         if ser:
@@ -392,6 +535,12 @@ def collect_and_analyze_hrv(serial_port, duration, baud_rate=9600):
             ser.close()
 
 
+def write_values(path, values):
+    """Write one integer per line with a single write call"""
+    text = "\n".join(map(str, values))
+    Path(path).write_text(text + "\n" if text else text)
+
+
 def main():
     """Main entry point"""
     # Get user input
@@ -420,18 +569,11 @@ def main():
     
     print("\nSession complete. Thank you!")
 
-    # output the ppg data to a txt file
-    with open("ppg_data.txt", "w") as f:
-        for ppg_value in all_ppg_data:
-            f.write(f"{ppg_value}\n")
-
-    with open("ppg_window_data.txt", "w") as f:
-        for ppg_value in ppg_window_data_combined:
-            f.write(f"{ppg_value}\n")
-    
-    with open("ppg_peaks_data.txt", "w") as f:
-        for peak_index in ppg_peaks_data_combined:
-            f.write(f"{peak_index}\n")
+    # output the ppg data to txt files, one value per line
+    write_values("ppg_data.txt", all_ppg_data)
+    write_values("ppg_window_data.txt",
+                 np.concatenate(ppg_window_data_combined).tolist() if ppg_window_data_combined else [])
+    write_values("ppg_peaks_data.txt", ppg_peaks_data_combined)
 
 
 if __name__ == "__main__":
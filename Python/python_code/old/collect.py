@@ -8,6 +8,7 @@ SERIAL_PORT = '/dev/ttyUSB0'  # Change to your Arduino port
 BAUD_RATE = 9600
 OUTPUT_FILE = 'serial_output.txt'
 DURATION_SECONDS = 300  # How long to record (0 = infinite, Ctrl+C to stop)
+FLUSH_EVERY_LINES = 100  # Flush the output file every N lines instead of every line
 
 def capture_serial_to_txt(port, baudrate, output_file, duration=0):
     """
@@ -32,8 +33,8 @@ def capture_serial_to_txt(port, baudrate, output_file, duration=0):
         else:
             print("Recording until Ctrl+C is pressed...")
         
-        # Open output file
-        with open(output_file, 'w', encoding='utf-8') as txtfile:
+        # Open output file (large buffer; flushed every FLUSH_EVERY_LINES lines)
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 16) as txtfile:
             # Write header with start time
             start_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             txtfile.write(f"Serial Monitor Capture Started: {start_timestamp}\n")
@@ -41,7 +42,12 @@ def capture_serial_to_txt(port, baudrate, output_file, duration=0):
             txtfile.write("="*60 + "\n\n")
             
             start_time = time.time()
+            perf_start = time.perf_counter()
             line_count = 0
+
+            # Timestamp prefix is only re-formatted when the second changes
+            cached_second = None
+            cached_prefix = ''
             
             while True:
                 # Check duration limit
@@ -56,11 +62,17 @@ def capture_serial_to_txt(port, baudrate, output_file, duration=0):
                         
                         if line:
                             # Write timestamp and line to file
-                            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                            txtfile.write(f"[{timestamp}] {line}\n")
-                            txtfile.flush()  # Ensure data is written immediately
+                            now = start_time + (time.perf_counter() - perf_start)
+                            second = int(now)
+                            if second != cached_second:
+                                cached_second = second
+                                cached_prefix = datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S')
+                            millis = int((now - second) * 1000)
+                            txtfile.write(f"[{cached_prefix}.{millis:03d}] {line}\n")
                             
                             line_count += 1
+                            if line_count % FLUSH_EVERY_LINES == 0:
+                                txtfile.flush()
                             # Print status every 10 lines
                             if line_count % 10 == 0:
                                 print(f"Lines recorded: {line_count}", end='\r')
@@ -1,70 +1,92 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import re
-from datetime import datetime
 import numpy as np
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to pandas' CSV writer
+    pa = None
+
 # Configuration
 INPUT_FILE = 'serial_output.txt'
 OUTPUT_CSV = 'parsed_data.csv'
+SAVE_DPI = 300
+
+# Compiled once at import
+# Status lines (waiting/detected heart beat) are dropped before parsing
+STATUS_RE = re.compile(r'Waiting for heart beat|Heart beat detected')
+# [ts] followed by data; each field is looked for anywhere in the data, so a line
+# carrying both formats fills both:
+# Format 1: [ts] >PPGSignal:438
+# Format 2: [ts] >PolarRealtimeBPM:63,PolarBPM:64
+LINE_RE = re.compile(
+    r'^\[(?P<ts>[\d\-: .]+)\]\s+(?=.)'
+    r'(?=(?:.*?>PPGSignal:(?P<ppg>\d+))?)'
+    r'(?=(?:.*?>PolarRealtimeBPM:(?P<prt>\d+),PolarBPM:(?P<pbpm>\d+))?)'
+)
+
+def to_small_uint(col):
+    """Convert a column of digit strings (NaN where absent) to the smallest nullable unsigned int"""
+    return pd.to_numeric(col, downcast='unsigned', dtype_backend='numpy_nullable')
 
 def parse_serial_output(input_file):
     """
     Parse serial_output.txt and extract data with forward-fill logic
     Each value holds until a new value arrives
     """
-    data = []
-    
-    # Current state - holds last known values
-    current_state = {
-        'PolarRealtimeBPM': None,
-        'PolarBPM': None,
-        'PPGSignal': None
-    }
-    
     with open(input_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            # Skip header lines and empty lines
-            if line.startswith('Serial Monitor') or line.startswith('Port:') or line.startswith('===') or not line.strip():
-                continue
-            
-            # Skip non-data lines
-            if 'Waiting for heart beat' in line or 'Heart beat detected' in line:
-                continue
-            
-            # Extract timestamp and data
-            match = re.match(r'\[([\d\-: .]+)\]\s+(.+)', line)
-            if match:
-                timestamp_str = match.group(1)
-                data_str = match.group(2).strip()
-                
-                # Try to parse timestamp
-                try:
-                    timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S.%f')
-                except:
-                    continue
-                
-                # Parse different data formats
-                # Format 1: >PPGSignal:438
-                ppg_match = re.search(r'>PPGSignal:(\d+)', data_str)
-                if ppg_match:
-                    current_state['PPGSignal'] = int(ppg_match.group(1))
-                
-                # Format 2: >PolarRealtimeBPM:63,PolarBPM:64
-                polar_match = re.search(r'>PolarRealtimeBPM:(\d+),PolarBPM:(\d+)', data_str)
-                if polar_match:
-                    current_state['PolarRealtimeBPM'] = int(polar_match.group(1))
-                    current_state['PolarBPM'] = int(polar_match.group(2))
-                
-                # Record current state with timestamp
-                data.append({
-                    'SystemTime': timestamp,
-                    'PolarRealtimeBPM': current_state['PolarRealtimeBPM'],
-                    'PolarBPM': current_state['PolarBPM'],
-                    'PPGSignal': current_state['PPGSignal']
-                })
-    
-    return pd.DataFrame(data)
+        lines = pd.Series(f.read().splitlines(), dtype=object)
+    
+    # Skip non-data lines, then extract timestamp and data in one vectorized pass
+    lines = lines[~lines.str.contains(STATUS_RE)]
+    ext = lines.str.extract(LINE_RE)
+    ext['ts'] = pd.to_datetime(ext['ts'], format='%Y-%m-%d %H:%M:%S.%f', errors='coerce')
+    ext = ext[ext['ts'].notna()]
+    
+    # Record current state with timestamp (forward-fill holds last known values)
+    # Smallest nullable unsigned ints that fit the data (UInt8 BPM, UInt16 PPG)
+    df = pd.DataFrame({
+        'SystemTime': ext['ts'],
+        'PolarRealtimeBPM': to_small_uint(ext['prt']),
+        'PolarBPM': to_small_uint(ext['pbpm']),
+        'PPGSignal': to_small_uint(ext['ppg'])
+    }).ffill()
+    
+    return df.reset_index(drop=True)
+
+def write_csv(df, output_csv):
+    """
+    Write the parsed data to CSV, using pyarrow's multi-threaded writer when installed
+    """
+    if pa is None:
+        df.to_csv(output_csv, index=False, chunksize=100_000)
+        return
+    
+    # Millisecond timestamps print like pandas' CSV instead of with 9 fractional digits
+    ts = df['SystemTime']
+    if ((ts.dt.microsecond % 1000 == 0) & (ts.dt.nanosecond == 0)).all():
+        df = df.assign(SystemTime=ts.astype('datetime64[ms]'))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pacsv.write_csv(table, output_csv, pacsv.WriteOptions(quoting_header='none'))
+
+def min_max_downsample(x, y, n_buckets):
+    """
+    Keep each bucket's min and max (in time order) so the plotted envelope is unchanged
+    """
+    n = len(y)
+    if n <= 4 * n_buckets:
+        return x, y
+    
+    # Equal-size buckets; the tail is padded with the last value
+    k = -(-n // n_buckets)
+    padded = np.pad(y, (0, k * n_buckets - n), mode='edge').reshape(n_buckets, k)
+    base = np.arange(n_buckets) * k
+    i_min = base + padded.argmin(axis=1)
+    i_max = base + padded.argmax(axis=1)
+    idx = np.minimum(np.column_stack((np.minimum(i_min, i_max), np.maximum(i_min, i_max))).ravel(), n - 1)
+    return x[idx], y[idx]
 
 def create_overlay_visualization(df):
     """
@@ -91,7 +113,11 @@ def create_overlay_visualization(df):
     color_ppg = 'steelblue'
     ax1.set_xlabel('Time (seconds)', fontsize=13)
     ax1.set_ylabel('PPG Signal (raw)', fontsize=13, color=color_ppg)
-    line1 = ax1.plot(ppg_data['TimeSeconds'], ppg_data['PPGSignal'], 
+    # One min/max pair per saved pixel column is all the PNG can show
+    ppg_t, ppg_y = min_max_downsample(ppg_data['TimeSeconds'].to_numpy(),
+                                      ppg_data['PPGSignal'].to_numpy(dtype=float),
+                                      int(fig.get_figwidth() * SAVE_DPI))
+    line1 = ax1.plot(ppg_t, ppg_y, 
                      linewidth=0.8, color=color_ppg, alpha=0.7, label='PPG Signal')
     ax1.tick_params(axis='y', labelcolor=color_ppg)
     ax1.grid(True, alpha=0.3, linestyle='--')
@@ -119,7 +145,7 @@ def create_overlay_visualization(df):
     plt.tight_layout()
     
     # Save the figure
-    plt.savefig('ppg_bpm_overlay.png', dpi=300, bbox_inches='tight')
+    plt.savefig('ppg_bpm_overlay.png', dpi=SAVE_DPI, bbox_inches='tight')
     print("✓ Overlay visualization saved to ppg_bpm_overlay.png")
     
     plt.show()
@@ -136,7 +162,7 @@ def create_csv_and_visualize(input_file, output_csv):
         return
     
     # Save to CSV
-    df.to_csv(output_csv, index=False)
+    write_csv(df, output_csv)
     print(f"CSV saved to {output_csv}")
     print(f"Total records: {len(df)}")
     
@@ -168,7 +194,10 @@ def create_csv_and_visualize(input_file, output_csv):
     ax1 = axes[0]
     ppg_data = df[df['PPGSignal'].notna()]
     if not ppg_data.empty:
-        ax1.plot(ppg_data['TimeSeconds'], ppg_data['PPGSignal'], 
+        ppg_t, ppg_y = min_max_downsample(ppg_data['TimeSeconds'].to_numpy(),
+                                          ppg_data['PPGSignal'].to_numpy(dtype=float),
+                                          int(fig.get_figwidth() * SAVE_DPI))
+        ax1.plot(ppg_t, ppg_y, 
                 linewidth=0.5, color='blue', alpha=0.7)
         ax1.set_ylabel('PPG Signal', fontsize=12)
         ax1.set_title(f'PPG Signal Over Time (n={len(ppg_data)} samples)', fontsize=12)
@@ -208,7 +237,7 @@ def create_csv_and_visualize(input_file, output_csv):
     plt.tight_layout()
     
     # Save the figure
-    plt.savefig('data_visualization.png', dpi=300, bbox_inches='tight')
+    plt.savefig('data_visualization.png', dpi=SAVE_DPI, bbox_inches='tight')
     print("✓ Original visualization saved to data_visualization.png")
     
     # Show the plot
@@ -229,7 +258,7 @@ def create_csv_and_visualize(input_file, output_csv):
         ax.legend(loc='upper right', fontsize=10)
         ax.grid(True, alpha=0.3)
         plt.tight_layout()
-        plt.savefig('heart_rate_comparison.png', dpi=300, bbox_inches='tight')
+        plt.savefig('heart_rate_comparison.png', dpi=SAVE_DPI, bbox_inches='tight')
         print("✓ Heart rate comparison saved to heart_rate_comparison.png")
         plt.show()
     
@@ -7,9 +7,7 @@ FS = 100  # Hz
 DATA_PATH = r"C:\Users\gur15\Documents\Capstone\Capstone\Python\python_code\archive_ppg_data\semi_normal_run.txt"
 
 def load_ppg(path):
-    with open(path, "r") as f:
-        data = [float(line.strip()) for line in f if line.strip()]
-    return np.array(data, dtype=float)
+    return np.loadtxt(path, dtype=np.float32, ndmin=1)
 
 def main():
     y = load_ppg(DATA_PATH)
@@ -18,11 +16,9 @@ def main():
 
     # Load detected peaks if available
     try:
-        with open("ppg_peaks.txt", "r") as f:
-            peaks_indices = [int(line.strip()) for line in f if line.strip()]
-        peaks_indices = np.array(peaks_indices, dtype=int)
+        peaks_indices = np.loadtxt("ppg_peaks.txt", dtype=np.int64, ndmin=1)
     except Exception:
-        peaks_indices = np.array([], dtype=int)
+        peaks_indices = np.array([], dtype=np.int64)
 
     win_sec = 5.0
     win_samples = int(win_sec * FS)
@@ -0,0 +1,83 @@
+"""
+Tests for converttocsvandvisualize.py against the original line-by-line parser
+
+Run from this directory:
+    python -m pytest test_converttocsvandvisualize.py
+"""
+
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import converttocsvandvisualize as conv
+
+SERIAL_FILE = os.path.join(os.path.dirname(__file__), '..', 'serial_output.txt')
+
+
+def parse_serial_output_lines(input_file):
+    """Reference: the original parser, one line at a time"""
+    data = []
+    current_state = {'PolarRealtimeBPM': None, 'PolarBPM': None, 'PPGSignal': None}
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('Serial Monitor') or line.startswith('Port:') or line.startswith('===') or not line.strip():
+                continue
+            if 'Waiting for heart beat' in line or 'Heart beat detected' in line:
+                continue
+
+            match = re.match(r'\[([\d\-: .]+)\]\s+(.+)', line)
+            if match:
+                try:
+                    timestamp = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S.%f')
+                except ValueError:
+                    continue
+                data_str = match.group(2).strip()
+
+                ppg_match = re.search(r'>PPGSignal:(\d+)', data_str)
+                if ppg_match:
+                    current_state['PPGSignal'] = int(ppg_match.group(1))
+                polar_match = re.search(r'>PolarRealtimeBPM:(\d+),PolarBPM:(\d+)', data_str)
+                if polar_match:
+                    current_state['PolarRealtimeBPM'] = int(polar_match.group(1))
+                    current_state['PolarBPM'] = int(polar_match.group(2))
+
+                data.append({'SystemTime': timestamp, **current_state})
+
+    return pd.DataFrame(data)
+
+
+def assert_same_parse(path):
+    expected = parse_serial_output_lines(path)
+    actual = conv.parse_serial_output(path)
+
+    assert len(actual) == len(expected)
+    assert (actual['SystemTime'].to_numpy() == pd.to_datetime(expected['SystemTime']).to_numpy()).all()
+    for col in ('PolarRealtimeBPM', 'PolarBPM', 'PPGSignal'):
+        np.testing.assert_array_equal(actual[col].to_numpy(dtype=float, na_value=np.nan),
+                                      expected[col].to_numpy(dtype=float, na_value=np.nan), err_msg=col)
+
+
+def test_parse_matches_line_parser_on_recorded_session():
+    assert_same_parse(SERIAL_FILE)
+
+
+def test_parse_matches_line_parser_on_mixed_lines(tmp_path):
+    with open(SERIAL_FILE, 'r', encoding='utf-8') as f:
+        sample = f.read().splitlines()[:400]
+    sample += [
+        '[2026-01-13 17:50:00.100] >PPGSignal:512 >PolarRealtimeBPM:71,PolarBPM:70',
+        '[2026-01-13 17:50:00.110] >PolarRealtimeBPM:72,PolarBPM:71 >PPGSignal:515',
+        '[2026-01-13 17:50:00.120] >PPGSignal:900 Waiting for heart beat...',
+        '[2026-01-13 17:50:00.130] Heart beat detected! >PolarRealtimeBPM:99,PolarBPM:99',
+        '[2026-01-13 17:50:00.140] some debug text',
+        '[2026-01-13 17:50:00.150] ',
+        '[2026-01-13 17:50:00.160] >PPGSignal:520',
+    ]
+    path = tmp_path / 'serial_output.txt'
+    path.write_text('\n'.join(sample) + '\n', encoding='utf-8')
+
+    assert_same_parse(str(path))
@@ -0,0 +1,89 @@
+"""
+Tests for testing.py against the recorded serial session
+
+Run from this directory:
+    python -m pytest test_testing.py
+"""
+
+import os
+
+import neurokit2 as nk
+import numpy as np
+import pytest
+
+import testing
+
+SERIAL_FILE = os.path.join(os.path.dirname(__file__), '..', 'serial_output.txt')
+SAMPLING_RATE = 57  # serial_output.txt was captured at ~57 Hz
+DURATION = 200
+
+
+def neurokit_rmssd(ppg_window, sampling_rate):
+    """Reference RMSSD: full nk.ppg_process + nk.hrv_time pipeline"""
+    _, info = nk.ppg_process(ppg_window, sampling_rate=sampling_rate)
+    return nk.hrv_time(info["PPG_Peaks"], sampling_rate=sampling_rate)['HRV_RMSSD'].values[0]
+
+
+def session_windows():
+    """(elapsed seconds, window) the simulator analyzes: 30 s windows every 10 s"""
+    values, elapsed = [], []
+    with open(SERIAL_FILE, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            timestamp, ppg_value = testing.parse_serial_line(line)
+            if timestamp is None:
+                continue
+            if not elapsed:
+                start = timestamp
+            values.append(ppg_value)
+            elapsed.append((timestamp - start).total_seconds())
+
+    window_size = 30 * SAMPLING_RATE
+    last = 0
+    for i, sim_elapsed in enumerate(elapsed):
+        if sim_elapsed > DURATION:
+            break
+        if sim_elapsed >= 30 and sim_elapsed - last >= 10 and min(i + 1, window_size) >= window_size * 0.8:
+            last = sim_elapsed
+            yield sim_elapsed, np.array(values[max(0, i + 1 - window_size):i + 1])
+
+
+def test_fast_rmssd_matches_neurokit_on_recorded_session():
+    windows = list(session_windows())
+    assert len(windows) >= 15
+    for sim_elapsed, ppg_window in windows:
+        expected = neurokit_rmssd(ppg_window, SAMPLING_RATE)
+        assert testing.fast_rmssd(ppg_window, SAMPLING_RATE) == pytest.approx(expected, abs=1e-9), sim_elapsed
+
+
+def test_simulator_windows_match_neurokit_on_recorded_session(monkeypatch):
+    reported = []
+    monkeypatch.setattr(testing, 'display_feedback',
+                        lambda status, current, previous, window: reported.append((window, current, status)))
+
+    testing.simulate_realtime_analysis(SERIAL_FILE, DURATION, sim_speed=1e6, sampling_rate=SAMPLING_RATE)
+
+    expected = [neurokit_rmssd(ppg_window, SAMPLING_RATE) for _, ppg_window in session_windows()]
+    assert [window for window, _, _ in reported] == list(range(1, len(expected) + 1))
+    assert [rmssd for _, rmssd, _ in reported] == pytest.approx(expected, abs=1e-9)
+    previous = [None] + expected[:-1]
+    assert [status for _, _, status in reported] == [
+        testing.check_hrv_status(current, prev) for current, prev in zip(expected, previous)]
+
+
+@pytest.mark.parametrize('line', [
+    '[2026-01-13 17:44:38|783] >PPGSignal:523\n',
+    '[2026/01/13 17:44:38.783] >PPGSignal:523\n',
+    '[2026-01-13T17:44:38.783] >PPGSignal:523\n',
+    '[2026-01-13 17-44-38.783] >PPGSignal:523\n',
+    '[2026-01-13 17:4x:38.783] >PPGSignal:523\n',
+    '[ 026-01-13 17:44:38.783] >PPGSignal:523\n',
+    '[2026-01-13 17:44:38.783] >PPGSignal:523\n',
+])
+def test_fixed_width_parse_matches_regex_on_malformed_timestamps(line):
+    assert testing.parse_serial_line(line) == testing.parse_serial_line_regex(line)
+
+
+def test_fixed_width_parse_matches_regex_on_recorded_session():
+    with open(SERIAL_FILE, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            assert testing.parse_serial_line(line) == testing.parse_serial_line_regex(line), line
@@ -1,31 +1,64 @@
 import time
 import re
 from datetime import datetime
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import neurokit2 as nk
+from scipy.signal import butter, sosfiltfilt
 import warnings
 import sys
 
 # Suppress all warnings from neurokit2 and pandas
 warnings.filterwarnings('ignore')
 
+# Compiled once at import
+LINE_RE = re.compile(r'\[([\d\-: .]+)\]\s+(.+)')
+PPG_RE = re.compile(r'>PPGSignal:(\d+)')
+PPG_MARKER = '>PPGSignal:'
+
+# Parsed whole-second timestamps keyed by 'YYYY-MM-DD HH:MM:SS'
+_ts_cache = {}
+
+# Bandpass filter coefficients keyed by sampling rate
+_sos_cache = {}
+
 
 class DualOutput:
-    """Write to both console and file"""
+    """Write to both console and file, batching print() fragments per line"""
+    BATCH_BYTES = 4096
+    
     def __init__(self, filename):
         self.terminal = sys.stdout
-        self.log = open(filename, 'w', encoding='utf-8')
+        self.log = open(filename, 'w', encoding='utf-8', buffering=1 << 16)
+        self._pending = []
+        self._pending_len = 0
     
     def write(self, message):
-        self.terminal.write(message)
-        self.log.write(message)
+        self._pending.append(message)
+        self._pending_len += len(message)
+        # Emit on line ends (incl. '\r' progress lines) or once enough has accumulated
+        if '\n' in message or '\r' in message or self._pending_len >= self.BATCH_BYTES:
+            self._emit()
+    
+    def _emit(self):
+        if not self._pending:
+            return
+        payload = ''.join(self._pending)
+        self._pending.clear()
+        self._pending_len = 0
+        self.terminal.write(payload)
+        self.log.write(payload)
     
     def flush(self):
+        self._emit()
         self.terminal.flush()
         self.log.flush()
     
+    def isatty(self):
+        return self.terminal.isatty()
+    
     def close(self):
+        self._emit()
         self.log.close()
 
 
@@ -61,7 +94,45 @@ def parse_serial_line(line):
     Returns: (timestamp, ppg_value) or (None, None) if not parseable
     """
     # Format: [2026-01-13 17:44:38.783] >PPGSignal:523
-    match = re.match(r'\[([\d\-: .]+)\]\s+(.+)', line)
+    # Fixed-width timestamp is sliced directly once its separators and digit runs
+    # check out; anything else goes through the regex
+    if (len(line) < 26 or line[0] != '[' or line[24] != ']' or not line[25].isspace()
+            or line[5] != '-' or line[8] != '-' or line[11] != ' ' or line[14] != ':'
+            or line[17] != ':' or line[20] != '.'
+            or not (line[1:5] + line[6:8] + line[9:11] + line[12:14] + line[15:17]
+                    + line[18:20] + line[21:24]).isdigit()):
+        return parse_serial_line_regex(line)
+    
+    # Extract PPG signal digits after the marker
+    idx = line.find(PPG_MARKER, 25)
+    if idx < 0:
+        return None, None
+    start = j = idx + len(PPG_MARKER)
+    while j < len(line) and line[j].isdigit():
+        j += 1
+    if j == start:
+        return None, None
+    
+    try:
+        # Whole-second part is parsed once per second and reused for ~100 lines
+        second = _ts_cache.get(line[1:20])
+        if second is None:
+            second = datetime(int(line[1:5]), int(line[6:8]), int(line[9:11]),
+                              int(line[12:14]), int(line[15:17]), int(line[18:20]))
+            _ts_cache[line[1:20]] = second
+        timestamp = second.replace(microsecond=int(line[21:24]) * 1000)
+        ppg_value = int(line[start:j])
+        return timestamp, ppg_value
+    except:
+        return None, None
+
+
+def parse_serial_line_regex(line):
+    """
+    Regex fallback for lines without the fixed-width millisecond timestamp
+    Returns: (timestamp, ppg_value) or (None, None) if not parseable
+    """
+    match = LINE_RE.match(line)
     if not match:
         return None, None
     
@@ -69,7 +140,7 @@ def parse_serial_line(line):
     data_str = match.group(2).strip()
     
     # Extract PPG signal
-    ppg_match = re.search(r'>PPGSignal:(\d+)', data_str)
+    ppg_match = PPG_RE.search(data_str)
     if not ppg_match:
         return None, None
     
@@ -81,6 +152,42 @@ def parse_serial_line(line):
         return None, None
 
 
+def get_bandpass_sos(sampling_rate):
+    """
+    Get 0.5-8 Hz Butterworth bandpass coefficients, designed once per sampling rate.
+    Same filter nk.ppg_clean designs on every call (default "elgendi" method).
+    """
+    sos = _sos_cache.get(sampling_rate)
+    if sos is None:
+        sos = butter(2, [0.5, 8], btype='bandpass', fs=sampling_rate, output='sos')
+        _sos_cache[sampling_rate] = sos
+    return sos
+
+
+def fast_rmssd(ppg_window, sampling_rate=100):
+    """
+    RMSSD from the same cleaning and peaks as nk.ppg_process + nk.hrv_time
+    
+    Skips the rate and signal quality columns ppg_process also computes, which
+    RMSSD doesn't use.
+    
+    Args:
+        ppg_window: Array of PPG signal values
+        sampling_rate: Sampling rate in Hz
+    
+    Returns:
+        RMSSD value in ms, or None if fewer than 3 beats were found
+    """
+    cleaned = sosfiltfilt(get_bandpass_sos(sampling_rate), np.asarray(ppg_window, dtype=np.float64))
+    _, info = nk.ppg_peaks(cleaned, sampling_rate=sampling_rate)
+    peaks = info["PPG_Peaks"]
+    if len(peaks) < 3:
+        return None
+    
+    ibi_ms = np.diff(peaks) / sampling_rate * 1000
+    return float(np.sqrt(np.mean(np.diff(ibi_ms) ** 2)))
+
+
 def calculate_hrv_rmssd(ppg_window, sampling_rate=100):
     """
     Calculate HRV using RMSSD from PPG signal
@@ -96,7 +203,11 @@ def calculate_hrv_rmssd(ppg_window, sampling_rate=100):
         return None
     
     try:
-        # Process PPG signal to find peaks
+        rmssd = fast_rmssd(ppg_window, sampling_rate)
+        if rmssd is not None:
+            return rmssd
+        
+        # Too few beats: let the full neurokit pipeline decide
         signals, info = nk.ppg_process(ppg_window, sampling_rate=sampling_rate)
         
         # Extract peaks for HRV calculation
@@ -193,6 +304,8 @@ def simulate_realtime_analysis(input_file, duration, sim_speed=10.0, sampling_ra
     """
     WINDOW_SIZE_SEC = 30
     UPDATE_INTERVAL_SEC = 10
+    PACE_EVERY = 100  # Samples between pacing checks
+    PROGRESS_EVERY = 1000  # Samples between progress lines
     
     window_size_samples = WINDOW_SIZE_SEC * sampling_rate
     
@@ -210,9 +323,10 @@ def simulate_realtime_analysis(input_file, duration, sim_speed=10.0, sampling_ra
         print(f"{'='*60}")
         print("\nCollecting initial data (30 seconds)...\n")
         
-        # Data structures
-        ppg_buffer = deque(maxlen=window_size_samples)  # Sliding window
-        all_ppg_data = []  # Store all data
+        # Sliding window (ring buffer: write position + number of valid samples)
+        ppg_ring = np.empty(window_size_samples, dtype=np.int32)
+        write_pos = 0
+        filled = 0
         
         start_time = time.time()
         simulation_start_time = None
@@ -224,9 +338,35 @@ def simulate_realtime_analysis(input_file, duration, sim_speed=10.0, sampling_ra
         # Track status counts for summary
         status_counts = {0: 0, 1: 0, 2: 0}
         
+        def report(window_number, current_rmssd):
+            nonlocal previous_rmssd
+            if current_rmssd is not None:
+                # Check HRV status
+                status = check_hrv_status(current_rmssd, previous_rmssd)
+                
+                # Track status
+                status_counts[status] += 1
+                
+                # Display feedback
+                display_feedback(status, current_rmssd, previous_rmssd, window_number)
+                
+                # Update previous RMSSD
+                previous_rmssd = current_rmssd
+            else:
+                print(f"\n[Window #{window_number}] Unable to calculate HRV")
+        
+        # HRV runs on a worker thread so ingestion and pacing don't stall;
+        # pending holds (window number, future) for the window in flight
+        pending = None
+        
         # Read file
-        with open(input_file, 'r', encoding='utf-8') as f:
+        with ThreadPoolExecutor(max_workers=1) as hrv_pool, open(input_file, 'r', encoding='utf-8') as f:
             for line in f:
+                # Report a finished HRV window
+                if pending is not None and pending[1].done():
+                    report(pending[0], pending[1].result())
+                    pending = None
+                
                 # Parse line
                 timestamp, ppg_value = parse_serial_line(line)
                 
@@ -245,54 +385,54 @@ def simulate_realtime_analysis(input_file, duration, sim_speed=10.0, sampling_ra
                     print("\n\nSimulation duration reached!")
                     break
                 
-                # Simulate timing (sleep to match real-time speed)
-                real_elapsed = time.time() - start_time
-                expected_real_time = sim_elapsed / sim_speed
-                sleep_time = expected_real_time - real_elapsed
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                # Simulate timing (sleep to match real-time speed), checked once
+                # per PACE_EVERY samples so fast runs don't pay a syscall per line
+                if sample_count % PACE_EVERY == 0:
+                    real_elapsed = time.time() - start_time
+                    expected_real_time = sim_elapsed / sim_speed
+                    sleep_time = expected_real_time - real_elapsed
+                    if sleep_time > 0.001:
+                        time.sleep(sleep_time)
                 
                 # Add data to buffer
-                ppg_buffer.append(ppg_value)
-                all_ppg_data.append(ppg_value)
+                ppg_ring[write_pos] = ppg_value
+                write_pos = (write_pos + 1) % window_size_samples
+                if filled < window_size_samples:
+                    filled += 1
                 sample_count += 1
                 
-                # Print progress
-                if sample_count % 100 == 0:
+                # Print progress (interactive console only)
+                if sample_count % PROGRESS_EVERY == 0 and sys.stdout.isatty():
                     print(f"Samples: {sample_count} | Sim Time: {sim_elapsed:.1f}s | Real Time: {(time.time()-start_time):.1f}s", end='\r')
                 
                 # Perform HRV calculation every 10 seconds (after initial 30 seconds)
                 if (sim_elapsed >= WINDOW_SIZE_SEC and 
                     sim_elapsed - last_calculation_time >= UPDATE_INTERVAL_SEC and
-                    len(ppg_buffer) >= window_size_samples * 0.8):  # Allow 20% tolerance
+                    filled >= window_size_samples * 0.8):  # Allow 20% tolerance
                     
                     window_count += 1
                     last_calculation_time = sim_elapsed
                     
-                    # Calculate HRV for current window
-                    ppg_window = np.array(ppg_buffer)
-                    current_rmssd = calculate_hrv_rmssd(ppg_window, sampling_rate)
+                    # Windows are reported in order: finish the previous one first
+                    if pending is not None:
+                        report(pending[0], pending[1].result())
                     
-                    if current_rmssd is not None:
-                        # Check HRV status
-                        status = check_hrv_status(current_rmssd, previous_rmssd)
-                        
-                        # Track status
-                        status_counts[status] += 1
-                        
-                        # Display feedback
-                        display_feedback(status, current_rmssd, previous_rmssd, window_count)
-                        
-                        # Update previous RMSSD
-                        previous_rmssd = current_rmssd
+                    # Copy of the window (oldest-to-newest order) so the ring buffer can keep filling
+                    if filled < window_size_samples:
+                        ppg_window = ppg_ring[:filled].copy()
                     else:
-                        print(f"\n[Window #{window_count}] Unable to calculate HRV")
+                        ppg_window = np.concatenate((ppg_ring[write_pos:], ppg_ring[:write_pos]))
+                    pending = (window_count, hrv_pool.submit(
+                        calculate_hrv_rmssd, ppg_window, sampling_rate))
+            
+            if pending is not None:
+                report(pending[0], pending[1].result())
         
         # Final summary
         print("\n" + "="*60)
         print("SESSION SUMMARY")
         print("="*60)
-        print(f"Total samples collected: {len(all_ppg_data)}")
+        print(f"Total samples collected: {sample_count}")
         print(f"Total HRV windows analyzed: {window_count}")
         if previous_rmssd:
             print(f"Final RMSSD: {previous_rmssd:.2f} ms")
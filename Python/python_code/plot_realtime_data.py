@@ -1,6 +1,13 @@
 # Simple PPG viewer for data stored in a text file. Plots only accepted windows and peaks. 
 # Allows scrolling through the data and adjusting the window size.
 # This is a local file for testing the plotting functionality with pre-recorded data, not the live Bluetooth stream.
+#
+# Usage:
+#   python plot_realtime_data.py                       accepted windows + peaks (defaults below)
+#   python plot_realtime_data.py semi_normal_run.txt   any PPG file, no peaks
+#   python plot_realtime_data.py DATA --peaks PEAKS    any PPG file with a peak index file
+
+import argparse
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -11,21 +18,43 @@ DATA_PATH = "ppg_window_data.txt"
 PEAKS_PATH = "ppg_peaks_data.txt"
 
 def load_ppg(path):
-    with open(path, "r") as f:
-        data = [float(line.strip()) for line in f if line.strip()]
-    return np.array(data, dtype=float)
+    return np.loadtxt(path, dtype=np.float32, ndmin=1)
+
+# Largest-Triangle-Three-Buckets: keep n_out points that preserve the peaks/troughs
+def lttb_downsample(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i < n_out - 3 else (n - 1, n)
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        # Pick the point forming the largest triangle with the previous pick and the average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+
+    return x[idx], y[idx]
 
 def load_peaks(path):
     try:
-        with open(path, "r") as f:
-            peaks = [int(line.strip()) for line in f if line.strip()]
-        return np.array(peaks, dtype=int)
+        return np.loadtxt(path, dtype=np.int64, ndmin=1)
     except FileNotFoundError:
-        return np.array([], dtype=int)
+        return np.array([], dtype=np.int64)
 
-def main():
-    y = load_ppg(DATA_PATH)
-    peaks = load_peaks(PEAKS_PATH)
+def main(data_path=DATA_PATH, peaks_path=PEAKS_PATH):
+    y = load_ppg(data_path)
+    peaks = load_peaks(peaks_path) if peaks_path else None
 
     n = len(y)
     t = np.arange(n) / FS
@@ -38,10 +67,16 @@ def main():
 
     start = 0
     end = min(start + win_samples, n)
-    line, = ax.plot(t[start:end], y[start:end], lw=1, color="blue")
-    peak_scatter, = ax.plot([], [], "ro", markersize=4)
-
-    ax.set_title("PPG Viewer (Window Combined + Peaks)")
+    # Line, peaks and the x-axis (its ticks move with the window) are animated:
+    # drawn by blitting over a cached background
+    ax.xaxis.set_animated(True)
+    line, = ax.plot(t[start:end], y[start:end], lw=1, color="blue", animated=True)
+    animated = [ax.xaxis, line]
+    if peaks is not None:
+        peak_scatter, = ax.plot([], [], "ro", markersize=4, animated=True)
+        animated.append(peak_scatter)
+
+    ax.set_title("PPG Viewer (Window Combined + Peaks)" if peaks is not None else "PPG Viewer")
     ax.set_xlabel("Time (s)")
     ax.set_ylabel("PPG")
     ax.grid(True)
@@ -51,10 +86,9 @@ def main():
     ax.set_ylim(*fixed_ylim)
     auto_scale = False
 
-    def autoscale(x, yseg):
+    def autoscale_ylim(yseg):
         pad = 0.05 * np.ptp(yseg) if np.ptp(yseg) > 0 else 1.0
-        ax.set_xlim(x[0], x[-1])
-        ax.set_ylim(np.min(yseg) - pad, np.max(yseg) + pad)
+        return (np.min(yseg) - pad, np.max(yseg) + pad)
 
     ax_start = plt.axes([0.12, 0.17, 0.78, 0.03])
     ax_win = plt.axes([0.12, 0.12, 0.78, 0.03])
@@ -69,6 +103,26 @@ def main():
     ax_btn_auto = plt.axes([0.30, 0.05, 0.20, 0.05])
     btn_auto = Button(ax_btn_auto, "Auto Scale: OFF")
 
+    # Sliders are redrawn by the blit below instead of a full draw_idle per move
+    s_start.drawon = False
+    s_win.drawon = False
+    ax_start.set_animated(True)
+    ax_win.set_animated(True)
+    animated += [ax_start, ax_win]
+    bg = None
+
+    def draw_animated():
+        for artist in animated:
+            fig.draw_artist(artist)
+
+    def on_draw(event):
+        # Cache everything static after each full draw (first show, resize, rescale)
+        nonlocal bg
+        bg = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_animated()
+
+    fig.canvas.mpl_connect("draw_event", on_draw)
+
     def update(_=None):
         start_sec = s_start.val
         win_sec = s_win.val
@@ -81,21 +135,31 @@ def main():
 
         x = t[start_idx:end_idx]
         yseg = y[start_idx:end_idx]
-        line.set_data(x, yseg)
-        ax.set_xlim(x[0], x[-1])
+        # Roughly two points per horizontal pixel is all the line can show
+        n_out = int(2 * ax.bbox.width)
+        if end_idx - start_idx > n_out:
+            line.set_data(*lttb_downsample(x, yseg, n_out))
+        else:
+            line.set_data(x, yseg)
 
         # Peaks in window
-        in_window = peaks[(peaks >= start_idx) & (peaks < end_idx)]
-        peak_x = in_window / FS
-        peak_y = y[in_window] if len(in_window) else np.array([])
-        peak_scatter.set_data(peak_x, peak_y)
-
-        if auto_scale:
-            autoscale(x, yseg)
+        if peaks is not None:
+            in_window = peaks[(peaks >= start_idx) & (peaks < end_idx)]
+            peak_x = in_window / FS
+            peak_y = y[in_window] if len(in_window) else np.array([])
+            peak_scatter.set_data(peak_x, peak_y)
+
+        # Scrolling only moves the x-limits, which the blitted x-axis redraws;
+        # a y-limit change needs a full redraw of the static background
+        ax.set_xlim(x[0], x[-1])
+        ylim = autoscale_ylim(yseg) if auto_scale else fixed_ylim
+        if bg is None or ax.get_ylim() != ylim:
+            ax.set_ylim(*ylim)
+            fig.canvas.draw_idle()
         else:
-            ax.set_ylim(*fixed_ylim)
-
-        fig.canvas.draw_idle()
+            fig.canvas.restore_region(bg)
+            draw_animated()
+            fig.canvas.blit(fig.bbox)
 
     def reset(event):
         s_win.set_val(5.0)
@@ -115,4 +179,12 @@ def main():
     plt.show()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scroll through recorded PPG data.")
+    parser.add_argument("data", nargs="?", help=f"PPG text file, one value per line (default: {DATA_PATH} with peaks)")
+    parser.add_argument("--peaks", help=f"peak index file to overlay (default: {PEAKS_PATH} when no data file is given)")
+    args = parser.parse_args()
+
+    if args.data is None:
+        main(DATA_PATH, args.peaks or PEAKS_PATH)
+    else:
+        main(args.data, args.peaks)
@@ -10,6 +10,8 @@ DEPENDENCIES:
 - numpy: Array operations and mathematical functions
 - scipy: Signal processing (filtering, peak detection)
 - json: Data serialization (for bridge communication)
+- orjson (optional): Faster JSON parsing/writing for the command-line path
+- ijson (optional): Streams dataPoints out of large input files
 
 INSTALL:
 pip install numpy scipy
@@ -17,6 +19,7 @@ pip install numpy scipy
 USAGE:
 1. As standalone script:
    python hrv_processor.py input.json output.json
+   python hrv_processor.py input_dir/ output_dir/   (every .json session, in parallel)
 
 2. As module (for Chaquopy):
    from python.hrv_processor import process_ppg_data
@@ -27,13 +30,30 @@ USAGE:
 """
 
 import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, List, Tuple, Optional
 import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.integrate import trapezoid
+from scipy.signal import butter, medfilt, sosfiltfilt, welch
 
-# Optional: Import scipy if available
-# from scipy import signal
-# from scipy.signal import find_peaks, butter, filtfilt
+try:
+    import orjson
+except ImportError:  # optional, the CLI falls back to the json module
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional, large inputs are then parsed in one go
+    ijson = None
+
+# Input files at least this big are streamed with ijson instead of parsed whole
+STREAM_THRESHOLD_BYTES = 1 << 20
 
 
 class HRVProcessor:
@@ -42,9 +62,33 @@ class HRVProcessor:
     
     Attributes:
         sample_rate: Sampling frequency in Hz (e.g., 130 for Polar H10)
-        filter_config: Configuration for signal filtering
+        _sos: Band-pass filter coefficients as second-order sections
+        _padlen: Edge padding sosfiltfilt adds for _sos; shorter signals can't be filtered
     """
     
+    # Band-pass corners (Hz) and Butterworth order for _filter_signal
+    FILTER_BAND = (0.5, 8.0)
+    FILTER_ORDER = 4
+    
+    # Shortest allowed gap between heartbeats in seconds (200 bpm)
+    MIN_PEAK_DISTANCE = 0.3
+    
+    # Peak threshold envelope: window in seconds (longer than one beat at 40 bpm) and
+    # how far above the envelope midpoint a peak must reach, as a fraction of its range
+    ENVELOPE_WINDOW = 1.5
+    ENVELOPE_OFFSET = 0.1
+    
+    # McNames impulse rejection: moving median length (beats) and threshold (robust SDs)
+    MEDIAN_KERNEL = 5
+    IMPULSE_THRESHOLD = 3.0
+    
+    # Frequency-domain HRV: tachogram resample rate (Hz), Welch FFT length (a power
+    # of 2, fixed so every call reuses the same FFT plan) and the LF/HF bands (Hz)
+    RESAMPLE_RATE = 4.0
+    WELCH_SEGMENT = 256
+    LF_BAND = (0.04, 0.15)
+    HF_BAND = (0.15, 0.4)
+    
     def __init__(self, sample_rate: float = 130.0):
         """
         Initialize HRV processor
@@ -53,7 +97,27 @@ class HRVProcessor:
             sample_rate: PPG sampling frequency in Hz
         """
         self.sample_rate = sample_rate
-        # TODO: Initialize filter parameters
+        self._sos = self._make_sos(sample_rate)
+        # sosfiltfilt's default padlen, 3 * (2 * sections + 1) less any trailing zero taps
+        taps = 2 * len(self._sos) + 1 - min((self._sos[:, 2] == 0).sum(), (self._sos[:, 5] == 0).sum())
+        self._padlen = 3 * int(taps)
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _make_sos(sample_rate: float) -> np.ndarray:
+        """
+        Design the band-pass filter once per sample rate
+        
+        Args:
+            sample_rate: PPG sampling frequency in Hz
+            
+        Returns:
+            Butterworth coefficients in second-order sections form
+        """
+        sos = butter(HRVProcessor.FILTER_ORDER, HRVProcessor.FILTER_BAND,
+                     btype='band', fs=sample_rate, output='sos')
+        # float32 like the extracted signal, so sosfiltfilt doesn't upcast it to float64
+        return sos.astype(np.float32)
         
     def process_ppg_data(self, ppg_data: Dict) -> Dict:
         """
@@ -64,48 +128,72 @@ class HRVProcessor:
                 - dataPoints: List of {timestamp, value} dicts
                 - sampleRate: Sampling rate in Hz
                 - sessionId: Session identifier
+                - source: 'H10_RR' when the device sends RR intervals instead
+                - rrIntervals: RR intervals in ms (only with source 'H10_RR')
                 
         Returns:
             Dictionary containing:
                 - rmssd: RMSSD value in ms
                 - sdnn: SDNN value in ms
                 - meanHR: Average heart rate in bpm
+                - lf: Low-frequency (0.04-0.15 Hz) power in ms²
+                - hf: High-frequency (0.15-0.4 Hz) power in ms²
                 - nnIntervals: List of NN intervals
                 - quality: Signal quality ('good', 'fair', 'poor')
                 - timestamp: Processing timestamp
         """
         
+        # Devices that report RR intervals themselves (Polar H10) skip the PPG steps
+        if ppg_data.get('source') == 'H10_RR':
+            return self._process_rr_direct(np.asarray(ppg_data['rrIntervals'], dtype=np.float64))
+        
         # STEP 1: Extract signal from data points
-        # signal = self._extract_signal(ppg_data['dataPoints'])
+        signal = self._extract_signal(ppg_data['dataPoints'])
         
-        # STEP 2: Preprocess signal (filter, normalize)
-        # filtered_signal = self._filter_signal(signal)
+        # STEP 2: Preprocess signal (filter, normalize). A recording no longer than the
+        # filter's edge padding can't be filtered and is treated as having no beats
+        filtered_signal = self._filter_signal(signal) if len(signal) > self._padlen else signal[:0]
         
         # STEP 3: Detect peaks (heartbeats)
-        # peak_indices = self._detect_peaks(filtered_signal)
+        peak_indices = self._detect_peaks(filtered_signal)
         
         # STEP 4: Calculate RR intervals
-        # rr_intervals = self._calculate_rr_intervals(peak_indices)
+        rr_intervals = self._calculate_rr_intervals(peak_indices)
         
+        # STEPS 5-7: Artifact rejection, HRV metrics, signal quality
+        return self._process_rr_direct(rr_intervals)
+    
+    def _process_rr_direct(self, rr_intervals: np.ndarray) -> Dict:
+        """
+        RR intervals → HRV metrics (steps 5-7 of process_ppg_data)
+        
+        Args:
+            rr_intervals: RR intervals in milliseconds, from PPG peaks or
+                straight from the device
+                
+        Returns:
+            Same result dictionary as process_ppg_data
+        """
         # STEP 5: Clean RR intervals (artifact rejection)
-        # clean_rr_intervals = self._remove_artifacts(rr_intervals)
+        clean_rr_intervals, valid_count = self._remove_artifacts(rr_intervals)
         
         # STEP 6: Calculate HRV metrics
-        # rmssd = self._calculate_rmssd(clean_rr_intervals)
-        # sdnn = self._calculate_sdnn(clean_rr_intervals)
-        # mean_hr = self._calculate_mean_hr(clean_rr_intervals)
+        rmssd, sdnn, mean_hr = self._stats(clean_rr_intervals)
+        lf, hf = self._calculate_frequency_domain(clean_rr_intervals)
         
         # STEP 7: Assess signal quality
-        # quality = self._assess_quality(clean_rr_intervals, rr_intervals)
+        quality = self._assess_quality(valid_count, len(rr_intervals))
         
         # Return results
         return {
-            'rmssd': 0.0,  # TODO: Implement
-            'sdnn': 0.0,
-            'meanHR': 0.0,
-            'nnIntervals': [],
-            'quality': 'good',
-            'timestamp': 0
+            'rmssd': rmssd,
+            'sdnn': sdnn,
+            'meanHR': mean_hr,
+            'lf': lf,
+            'hf': hf,
+            'nnIntervals': clean_rr_intervals.tolist(),
+            'quality': quality,
+            'timestamp': int(time.time() * 1000)
         }
     
     def _extract_signal(self, data_points: List[Dict]) -> np.ndarray:
@@ -113,15 +201,19 @@ class HRVProcessor:
         Extract PPG signal values from data points
         
         Args:
-            data_points: List of {timestamp, value} dictionaries
+            data_points: List of {timestamp, value} dictionaries, or the
+                values already extracted as an array (streamed input)
             
         Returns:
             NumPy array of PPG values
         """
-        # TODO: Extract 'value' from each data point
-        # values = [dp['value'] for dp in data_points]
-        # return np.array(values, dtype=float)
-        pass
+        if isinstance(data_points, np.ndarray):
+            return data_points.astype(np.float32, copy=False)
+        
+        # Fill one preallocated float32 array instead of boxing every value in a list first
+        # itemgetter + map keeps the per-point lookup in C rather than a generator frame
+        return np.fromiter(map(itemgetter('value'), data_points),
+                           dtype=np.float32, count=len(data_points))
     
     def _filter_signal(self, signal: np.ndarray) -> np.ndarray:
         """
@@ -143,16 +235,10 @@ class HRVProcessor:
         2. Moving average for baseline removal
         3. Savitzky-Golay filter for smoothing
         """
-        # TODO: Implement filtering
-        # Example using scipy:
-        # low_cutoff = 0.5  # Hz
-        # high_cutoff = 8.0  # Hz
-        # order = 4
-        # b, a = butter(order, [low_cutoff, high_cutoff], 
-        #               btype='band', fs=self.sample_rate)
-        # filtered = filtfilt(b, a, signal)
-        # return filtered
-        pass
+        # Zero-phase: a causal pass delays each PPG harmonic by a different amount,
+        # which distorts the pulse shape and shifts beat times enough to move RMSSD.
+        # SOS stays numerically stable at this order where (b, a) doesn't
+        return sosfiltfilt(self._sos, signal)
     
     def _detect_peaks(self, signal: np.ndarray) -> np.ndarray:
         """
@@ -164,23 +250,40 @@ class HRVProcessor:
         Returns:
             Array of peak indices
             
-        ALGORITHMS:
-        1. Threshold-based: Find values above adaptive threshold
-        2. Derivative-based: Find zero-crossings of first derivative
-        3. scipy.signal.find_peaks with distance and prominence
+        ALGORITHM:
+        Local maxima above an adaptive threshold taken from the rolling
+        max/min envelope, then a minimum-distance pass keeping the taller peak
         
         CONSTRAINTS:
         - Minimum distance between peaks: ~300ms (200 bpm max)
         - Minimum peak prominence: Depends on signal amplitude
         """
-        # TODO: Implement peak detection
-        # Example using scipy:
-        # min_distance = int(0.3 * self.sample_rate)  # 300ms
-        # peaks, properties = find_peaks(signal, 
-        #                                distance=min_distance,
-        #                                prominence=0.5)
-        # return peaks
-        pass
+        # Adaptive threshold from the rolling max/min envelope, so peaks are judged against
+        # the local amplitude rather than one level for the whole recording
+        window = int(self.ENVELOPE_WINDOW * self.sample_rate) | 1  # odd, so it centres on each sample
+        upper = maximum_filter1d(signal, window)
+        lower = minimum_filter1d(signal, window)
+        threshold = (upper + lower) / 2 + self.ENVELOPE_OFFSET * (upper - lower)
+        
+        # Local maxima above the threshold, found in one vector pass
+        middle = signal[1:-1]
+        candidates = np.flatnonzero((middle > signal[:-2]) & (middle >= signal[2:]) &
+                                    (middle > threshold[1:-1])) + 1
+        
+        # Single greedy pass for the spacing: a candidate closer than min_distance to the
+        # last accepted peak replaces it only if it's taller (no heap, no sort)
+        min_distance = int(self.MIN_PEAK_DISTANCE * self.sample_rate)
+        heights = signal[candidates].tolist()
+        peaks = []
+        last_height = 0.0
+        for idx, height in zip(candidates.tolist(), heights):
+            if not peaks or idx - peaks[-1] >= min_distance:
+                peaks.append(idx)
+                last_height = height
+            elif height > last_height:
+                peaks[-1] = idx
+                last_height = height
+        return np.array(peaks, dtype=np.int64)
     
     def _calculate_rr_intervals(self, peak_indices: np.ndarray) -> np.ndarray:
         """
@@ -194,46 +297,54 @@ class HRVProcessor:
         Returns:
             Array of RR intervals in milliseconds
         """
-        # TODO: Implement RR interval calculation
-        # Convert sample indices to time intervals:
-        # rr_samples = np.diff(peak_indices)  # Difference between consecutive peaks
-        # rr_intervals = (rr_samples / self.sample_rate) * 1000.0  # Convert to ms
-        # return rr_intervals
-        pass
+        return np.diff(peak_indices) * (1000.0 / self.sample_rate)
     
-    def _remove_artifacts(self, rr_intervals: np.ndarray) -> np.ndarray:
+    def _remove_artifacts(self, rr_intervals: np.ndarray) -> Tuple[np.ndarray, int]:
         """
         Remove artifacts and ectopic beats from RR intervals
         
         ARTIFACT TYPES:
         1. Physiologically impossible values (< 300ms or > 2000ms)
-        2. Statistical outliers (> 3 standard deviations from mean)
-        3. Sudden changes (> 20% difference from previous interval)
+        2. Impulses: McNames' impulse rejection filter flags intervals whose
+           distance from the 5-beat moving median exceeds 3 robust standard
+           deviations (1.483 * MAD). Unlike mean +/- 3 SD, the threshold
+           isn't dragged along by the artifacts themselves. The robust SD is
+           floored at one sample period: PPG intervals come in whole samples,
+           so a steady rhythm has a MAD of exactly 0.
+        
+        Rejected intervals are replaced by linear interpolation between the
+        nearest accepted neighbours, so the output keeps the input's length.
         
         Args:
             rr_intervals: Raw RR intervals
             
         Returns:
-            Cleaned RR intervals (NN intervals)
+            Tuple of (cleaned RR intervals (NN intervals), number of intervals
+            accepted before interpolation)
         """
-        # TODO: Implement artifact rejection
-        # 1. Remove physiologically impossible values
-        # valid = (rr_intervals >= 300) & (rr_intervals <= 2000)
-        # clean = rr_intervals[valid]
-        
-        # 2. Remove statistical outliers
-        # mean_rr = np.mean(clean)
-        # std_rr = np.std(clean)
-        # valid = np.abs(clean - mean_rr) <= 3 * std_rr
-        # clean = clean[valid]
-        
-        # 3. Remove sudden changes
-        # diffs = np.abs(np.diff(clean) / clean[:-1])
-        # valid = np.concatenate([[True], diffs < 0.2])
-        # clean = clean[valid]
-        
-        # return clean
-        pass
+        n = len(rr_intervals)
+        valid = (rr_intervals >= 300) & (rr_intervals <= 2000)
+        
+        if n >= self.MEDIAN_KERNEL:
+            # Edge padding so the first/last beats get a real median instead of medfilt's zeros
+            half = self.MEDIAN_KERNEL // 2
+            padded = np.pad(rr_intervals, half, mode='edge')
+            moving_median = medfilt(padded, self.MEDIAN_KERNEL)[half:-half]
+            deviation = np.abs(rr_intervals - moving_median)
+            robust_sd = max(1.483 * np.median(deviation), 1000.0 / self.sample_rate)
+            valid &= deviation < self.IMPULSE_THRESHOLD * robust_sd
+        
+        valid_count = int(np.count_nonzero(valid))
+        if valid_count == n:
+            return rr_intervals, valid_count
+        if valid_count == 0:
+            return rr_intervals[:0], 0
+        
+        good = np.flatnonzero(valid)
+        bad = np.flatnonzero(~valid)
+        clean = rr_intervals.copy()
+        clean[bad] = np.interp(bad, good, rr_intervals[good])
+        return clean, valid_count
     
     def _calculate_rmssd(self, nn_intervals: np.ndarray) -> float:
         """
@@ -250,19 +361,16 @@ class HRVProcessor:
         Returns:
             RMSSD in milliseconds
         """
-        # TODO: Implement RMSSD calculation
-        # if len(nn_intervals) < 2:
-        #     return 0.0
-        # 
-        # successive_diffs = np.diff(nn_intervals)
-        # squared_diffs = successive_diffs ** 2
-        # mean_squared_diff = np.mean(squared_diffs)
-        # rmssd = np.sqrt(mean_squared_diff)
-        # 
-        # return float(rmssd)
-        pass
+        if len(nn_intervals) < 2:
+            return 0.0
+        
+        # Sum of squares as one dot product instead of squaring into another array
+        successive_diffs = nn_intervals[1:] - nn_intervals[:-1]
+        sum_sq = np.einsum('i,i->', successive_diffs, successive_diffs, dtype=np.float64)
+        return float(np.sqrt(sum_sq / successive_diffs.size))
     
-    def _calculate_sdnn(self, nn_intervals: np.ndarray) -> float:
+    def _calculate_sdnn(self, nn_intervals: np.ndarray,
+                        mean_nn: Optional[float] = None) -> float:
         """
         Calculate SDNN (Standard Deviation of NN intervals)
         
@@ -271,17 +379,24 @@ class HRVProcessor:
         
         Args:
             nn_intervals: Clean NN intervals in milliseconds
+            mean_nn: Mean of nn_intervals if already known
             
         Returns:
             SDNN in milliseconds
         """
-        # TODO: Implement SDNN calculation
-        # if len(nn_intervals) < 2:
-        #     return 0.0
-        # return float(np.std(nn_intervals))
-        pass
+        if len(nn_intervals) < 2:
+            return 0.0
+        if mean_nn is None:
+            mean_nn = nn_intervals.sum(dtype=np.float64) / nn_intervals.size
+        
+        # Variance as E[x^2] - mean^2: one pass, no (nn - mean) temporary. The sums are
+        # accumulated in float64 since E[x^2] - mean^2 cancels most of their digits
+        sum_sq = np.einsum('i,i->', nn_intervals, nn_intervals, dtype=np.float64)
+        variance = sum_sq / nn_intervals.size - mean_nn * mean_nn
+        return float(np.sqrt(max(variance, 0.0)))
     
-    def _calculate_mean_hr(self, nn_intervals: np.ndarray) -> float:
+    def _calculate_mean_hr(self, nn_intervals: np.ndarray,
+                           mean_nn: Optional[float] = None) -> float:
         """
         Calculate mean heart rate from NN intervals
         
@@ -289,45 +404,152 @@ class HRVProcessor:
         
         Args:
             nn_intervals: Clean NN intervals in milliseconds
+            mean_nn: Mean of nn_intervals if already known
             
         Returns:
             Mean heart rate in beats per minute
         """
-        # TODO: Implement mean HR calculation
-        # if len(nn_intervals) == 0:
-        #     return 0.0
-        # mean_interval = np.mean(nn_intervals)
-        # mean_hr = 60000.0 / mean_interval
-        # return float(mean_hr)
-        pass
+        if len(nn_intervals) == 0:
+            return 0.0
+        if mean_nn is None:
+            mean_nn = nn_intervals.sum(dtype=np.float64) / nn_intervals.size
+        return float(60000.0 / mean_nn)
+    
+    def _stats(self, nn_intervals: np.ndarray) -> Tuple[float, float, float]:
+        """
+        Calculate the per-window HRV metrics together so the mean is summed once
+        
+        Args:
+            nn_intervals: Clean NN intervals in milliseconds
+            
+        Returns:
+            Tuple of (RMSSD in ms, SDNN in ms, mean heart rate in bpm)
+        """
+        if len(nn_intervals) == 0:
+            return 0.0, 0.0, 0.0
+        mean_nn = float(nn_intervals.sum(dtype=np.float64) / nn_intervals.size)
+        return (self._calculate_rmssd(nn_intervals),
+                self._calculate_sdnn(nn_intervals, mean_nn),
+                self._calculate_mean_hr(nn_intervals, mean_nn))
+    
+    def _calculate_frequency_domain(self, nn_intervals: np.ndarray) -> Tuple[float, float]:
+        """
+        Calculate LF and HF power from the NN tachogram
+        
+        The NN series is resampled onto an even RESAMPLE_RATE grid by linear
+        interpolation and its spectrum estimated with Welch's method. LF
+        needs about 2 minutes of beats to be meaningful.
+        
+        Args:
+            nn_intervals: Clean NN intervals in milliseconds
+            
+        Returns:
+            Tuple of (LF power, HF power) in ms²
+        """
+        if len(nn_intervals) < 3:
+            return 0.0, 0.0
+        
+        beat_times = np.cumsum(nn_intervals) / 1000.0
+        grid = np.arange(beat_times[0], beat_times[-1], 1.0 / self.RESAMPLE_RATE)
+        tachogram = np.interp(grid, beat_times, nn_intervals)
+        
+        # Shorter series are zero-padded up to the fixed FFT length
+        freqs, psd = welch(tachogram, fs=self.RESAMPLE_RATE,
+                           nperseg=min(self.WELCH_SEGMENT, len(tachogram)),
+                           nfft=self.WELCH_SEGMENT)
+        
+        def band_power(band):
+            in_band = (freqs >= band[0]) & (freqs < band[1])
+            return float(trapezoid(psd[in_band], freqs[in_band]))
+        
+        return band_power(self.LF_BAND), band_power(self.HF_BAND)
     
-    def _assess_quality(self, clean_intervals: np.ndarray, 
-                       raw_intervals: np.ndarray) -> str:
+    def _assess_quality(self, valid: int, total: int) -> str:
         """
         Assess signal quality based on processing results
         
         QUALITY CRITERIA:
-        - Percentage of valid intervals after cleaning
-        - Coefficient of variation
-        - Number of detected beats
+        - Percentage of intervals accepted by artifact rejection
+        - Number of accepted beats
         
         Args:
-            clean_intervals: NN intervals after artifact removal
-            raw_intervals: RR intervals before cleaning
+            valid: RR intervals in this window accepted by _remove_artifacts
+            total: RR intervals in this window before artifact rejection
             
         Returns:
             Quality rating: 'good', 'fair', or 'poor'
         """
-        # TODO: Implement quality assessment
-        # valid_percentage = len(clean_intervals) / len(raw_intervals)
-        # 
-        # if valid_percentage > 0.9 and len(clean_intervals) > 50:
-        #     return 'good'
-        # elif valid_percentage > 0.7 and len(clean_intervals) > 30:
-        #     return 'fair'
-        # else:
-        #     return 'poor'
-        pass
+        if valid > 0.9 * total and valid > 50:
+            return 'good'
+        elif valid > 0.7 * total and valid > 30:
+            return 'fair'
+        else:
+            return 'poor'
+
+
+def _stream_values(f, header: Dict):
+    """
+    Yield each dataPoints value from a JSON file without building the point dicts
+    
+    Args:
+        f: Input file opened in binary mode
+        header: Dictionary that the other fields are stored in as they are parsed:
+            top-level scalars (sampleRate, sessionId, source, ...) and the
+            rrIntervals list of an H10_RR payload
+    """
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if prefix == 'dataPoints.item.value':
+            yield value
+        elif prefix == 'rrIntervals.item':
+            header['rrIntervals'].append(value)
+        elif prefix == 'rrIntervals' and event == 'start_array':
+            header['rrIntervals'] = []
+        elif event in ('number', 'string') and '.' not in prefix:
+            header[prefix] = value
+
+
+def _load_input(path: str) -> Dict:
+    """
+    Load a PPG session file, streaming dataPoints straight into an array when large
+    
+    Args:
+        path: Path to the input JSON file
+        
+    Returns:
+        Session dictionary; dataPoints is a float32 array for streamed files
+    """
+    with open(path, 'rb') as f:
+        if ijson is None or os.path.getsize(path) < STREAM_THRESHOLD_BYTES:
+            return orjson.loads(f.read()) if orjson else json.load(f)
+        
+        ppg_data = {}
+        values = np.fromiter(_stream_values(f, ppg_data), dtype=np.float32)
+        ppg_data['dataPoints'] = values
+        return ppg_data
+
+
+def _process_file(input_file: str, output_file: str) -> None:
+    """
+    Process one session file and write its HRV results
+    
+    Args:
+        input_file: Path to the input JSON file
+        output_file: Path the result JSON is written to
+    """
+    # Load input data
+    ppg_data = _load_input(input_file)
+    
+    # Process data
+    processor = HRVProcessor(sample_rate=ppg_data.get('sampleRate', 130))
+    result = processor.process_ppg_data(ppg_data)
+    
+    # Save output
+    if orjson:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(output_file, 'w') as f:
+            json.dump(result, f, indent=2)
 
 
 def main():
@@ -336,6 +558,7 @@ def main():
     
     Usage:
         python hrv_processor.py input.json output.json
+        python hrv_processor.py input_dir/ output_dir/
         python hrv_processor.py --test
     """
     if len(sys.argv) > 1 and sys.argv[1] == '--test':
@@ -346,26 +569,27 @@ def main():
     
     if len(sys.argv) < 3:
         print("Usage: python hrv_processor.py <input.json> <output.json>")
+        print("   or: python hrv_processor.py <input_dir> <output_dir>")
         print("   or: python hrv_processor.py --test")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    
-    # Load input data
-    with open(input_file, 'r') as f:
-        ppg_data = json.load(f)
+    input_path = sys.argv[1]
+    output_path = sys.argv[2]
     
-    # Process data
-    processor = HRVProcessor(sample_rate=ppg_data.get('sampleRate', 130))
-    result = processor.process_ppg_data(ppg_data)
+    if not os.path.isdir(input_path):
+        _process_file(input_path, output_path)
+        print(f"Processing complete. Results saved to {output_path}")
+        return
     
-    # Save output
-    with open(output_file, 'w') as f:
-        json.dump(result, f, indent=2)
+    # Directory of sessions: each file is independent, so fan them out across cores
+    names = sorted(name for name in os.listdir(input_path) if name.endswith('.json'))
+    os.makedirs(output_path, exist_ok=True)
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(_process_file,
+                          [os.path.join(input_path, name) for name in names],
+                          [os.path.join(output_path, name) for name in names]))
     
-    print(f"Processing complete. Results saved to {output_file}")
-
+    print(f"Processing complete. {len(names)} sessions saved to {output_path}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,96 @@
+"""
+Tests for hrv_processor
+
+Run from this directory:
+    python -m pytest test_hrv_processor.py
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import hrv_processor
+from hrv_processor import HRVProcessor, _load_input
+
+
+def _results_match(a, b):
+    a, b = dict(a), dict(b)
+    a.pop('timestamp')
+    b.pop('timestamp')
+    return a == pytest.approx(b)
+
+
+def test_large_h10_rr_file_is_streamed_with_its_rr_intervals(tmp_path):
+    pytest.importorskip('ijson')
+    rng = np.random.default_rng(0)
+    rr = (800 + 40 * rng.standard_normal(200_000)).round(1).tolist()
+    payload = {'sessionId': 'h10', 'source': 'H10_RR', 'rrIntervals': rr}
+    path = tmp_path / 'h10.json'
+    path.write_text(json.dumps(payload))
+    assert os.path.getsize(path) >= hrv_processor.STREAM_THRESHOLD_BYTES
+
+    ppg_data = _load_input(str(path))
+
+    assert ppg_data['source'] == 'H10_RR'
+    assert ppg_data['rrIntervals'] == pytest.approx(rr)
+    assert _results_match(HRVProcessor().process_ppg_data(ppg_data),
+                          HRVProcessor().process_ppg_data(payload))
+
+
+def test_large_ppg_file_streams_the_same_values(tmp_path):
+    pytest.importorskip('ijson')
+    t = np.arange(120_000) / 100
+    values = (2000 + 300 * np.sin(2 * np.pi * 1.2 * t)).round().tolist()
+    payload = {'sessionId': 'ppg', 'sampleRate': 100,
+               'dataPoints': [{'timestamp': 10 * i, 'value': v} for i, v in enumerate(values)]}
+    path = tmp_path / 'ppg.json'
+    path.write_text(json.dumps(payload))
+    assert os.path.getsize(path) >= hrv_processor.STREAM_THRESHOLD_BYTES
+
+    ppg_data = _load_input(str(path))
+
+    assert ppg_data['sampleRate'] == 100
+    assert isinstance(ppg_data['dataPoints'], np.ndarray)
+    assert _results_match(HRVProcessor(100).process_ppg_data(ppg_data),
+                          HRVProcessor(100).process_ppg_data(payload))
+
+
+def test_quality_rates_each_window_on_its_own():
+    rng = np.random.default_rng(1)
+    clean = 800 + 10 * rng.standard_normal(60)
+    noisy = clean.copy()
+    noisy[::3] = 1900
+    processor = HRVProcessor()
+
+    first = processor.process_ppg_data({'sessionId': 's', 'source': 'H10_RR', 'rrIntervals': noisy})
+    second = processor.process_ppg_data({'sessionId': 's', 'source': 'H10_RR', 'rrIntervals': clean})
+
+    assert first['quality'] == 'poor'
+    assert second['quality'] == 'good'
+
+
+@pytest.mark.parametrize('sd', [4, 6, 10])
+def test_impulse_is_rejected_from_quantized_low_variance_rr(sd):
+    processor = HRVProcessor(100)
+    for seed in range(50):
+        rng = np.random.default_rng(seed)
+        # PPG peaks at 100 Hz give RR intervals in 10 ms steps
+        rr = np.round((800 + sd * rng.standard_normal(60)) / 10) * 10
+        rr[30] = 1600
+
+        result = processor.process_ppg_data({'sessionId': 's', 'source': 'H10_RR', 'rrIntervals': rr})
+
+        assert max(result['nnIntervals']) < 1000, seed
+
+
+@pytest.mark.parametrize('n', [1, 2, 10, 27, 28])
+def test_short_recording_returns_empty_metrics(n):
+    points = [{'timestamp': 10 * i, 'value': 2000 + (i % 7)} for i in range(n)]
+
+    result = HRVProcessor(100).process_ppg_data({'sessionId': 's', 'sampleRate': 100, 'dataPoints': points})
+
+    assert result['rmssd'] == 0.0
+    assert result['nnIntervals'] == []
+    assert result['quality'] == 'poor'
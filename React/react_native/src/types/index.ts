@@ -42,12 +42,15 @@ export interface PPGDataBatch {
  * rmssd: Root Mean Square of Successive Differences (ms)
  * sdnn: Standard Deviation of NN intervals (ms)
  * meanHR: Average heart rate (bpm)
+ * lf / hf: Low- / high-frequency spectral power (ms²)
  * nnIntervals: Array of beat-to-beat intervals (ms)
  */
 export interface HRVMetrics {
   rmssd: number;
   sdnn?: number;
   meanHR?: number;
+  lf?: number;
+  hf?: number;
   nnIntervals?: number[];
   timestamp: number;
   quality?: 'good' | 'fair' | 'poor'; // Signal quality indicator